@@ -1,4 +1,8 @@
+import pickle
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
 from pathlib import Path
+from typing import Any, overload
 
 import numpy as np
 
@@ -13,87 +17,136 @@ def read_sequence(
     gzi_path: str | Path | None = None,
     fai_path: str | Path | None = None,
 ) -> np.ndarray:
-    fasta_path = str(fasta_path)
-    if gzi_path is None:
-        gzi_path = f"{fasta_path}.gzi"
-    else:
+    fasta_path, gzi_path, fai_path = _index_paths(fasta_path, gzi_path, fai_path)
+    return _rust.read_sequence(fasta_path, gzi_path, fai_path, contig, start, length)
+
+
+def read_sequences(
+    fasta_path: str | Path,
+    queries: Sequence[tuple[str, int, int]],
+    gzi_path: str | Path | None = None,
+    fai_path: str | Path | None = None,
+) -> list[np.ndarray]:
+    """Read `(contig, start, length)` queries from one FASTA file in parallel.
+
+    Like the loaders' batched reads, this is safe to call in forked workers.
+    """
+    fasta_path, gzi_path, fai_path = _index_paths(fasta_path, gzi_path, fai_path)
+    return _rust.read_sequences(fasta_path, gzi_path, fai_path, queries)
+
+
+def _index_paths(
+    fasta_path: str | Path, gzi_path: str | Path | None, fai_path: str | Path | None
+) -> tuple[str, str | None, str]:
+    # Fast path for pre-stringified paths, which is the common case on hot loops
+    if not isinstance(fasta_path, str):
+        fasta_path = str(fasta_path)
+    # Without a .gzi path, the Rust side tells compressed from uncompressed files itself
+    if gzi_path is not None and not isinstance(gzi_path, str):
         gzi_path = str(gzi_path)
     if fai_path is None:
-        fai_path = f"{fasta_path}.fai"
-    else:
+        fai_path = fasta_path + ".fai"
+    elif not isinstance(fai_path, str):
         fai_path = str(fai_path)
-    return _rust.read_sequence(fasta_path, gzi_path, fai_path, contig, start, length)
+    return fasta_path, gzi_path, fai_path
 
 
-class FastarLoader:
-    def __init__(
-        self,
-        path: str | Path,
-        strict: bool = True,
-        force_build: bool = False,
-        no_cache: bool | None = None,
-        min_contig_length: int = 0,
-        num_workers: int | None = None,
-        show_progress: bool | None = None,
-        storage_method: str | None = None,
-        names: list[str] | None = None,
-    ):
-        if names is None:
-            if no_cache is None:
-                no_cache = False
-            if storage_method is None:
-                storage_method = "mmap"
-            if show_progress is None:
-                show_progress = True
-        else:
-            if no_cache is None:
-                no_cache = True
-            if storage_method is None:
-                storage_method = "memory"
-            if show_progress is None:
-                show_progress = False
-        self._path = str(path)
-        self._index_map = _rust.FastaMap.load(
-            self._path,
-            strict,
-            force_build,
-            no_cache,
-            min_contig_length,
-            num_workers,
-            show_progress,
-            storage_method,
-            names,
-        )
+class NameList(Sequence[str]):
+    """Read-only, sorted list of names which checks membership by binary search."""
+
+    def __init__(self, names: list[str]):
+        self._names = names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        return self._names[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        i = bisect_left(self._names, name)
+        return i < len(self._names) and self._names[i] == name
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, NameList):
+            return self._names == other._names
+        # Strings are sequences too, but a name list never equals one
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return self._names == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"NameList({self._names!r})"
+
+
+class ContigList(Sequence[tuple[str, int]]):
+    """Read-only list of `(contig, length)` pairs which decodes contig names on access.
+
+    Names and lengths are stored as separate columns, see `names` and `lengths`.
+    """
+
+    def __init__(self, contigs: tuple[list[bytes], np.ndarray]):
+        self._names, self._lengths = contigs
+        # Contig lists are cached by the loaders, so they must not be modified
+        self._lengths.flags.writeable = False
 
     @property
     def names(self) -> list[str]:
-        return self._index_map.names
+        return [name.decode() for name in self._names]
 
-    def contigs(self, name: str) -> list[tuple[str, int]]:
-        return [
-            (contig.decode("utf-8"), length) for contig, length in self._index_map.contigs(name)
-        ]
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths
 
-    def read_sequence(self, name: str, contig: str, start: int, length: int) -> np.ndarray:
-        return self._index_map.read_sequence(name, contig.encode(), start, length)
+    def __len__(self) -> int:
+        return len(self._names)
 
-    def __getstate__(self) -> dict[str, object]:
-        d = self.__dict__.copy()
-        handle = self._index_map.handle
-        if handle is None:
-            raise RuntimeError(
-                "Cannot serialize FastarLoader with non-shared storage (e.g., in-memory storage)!"
-            )
-        d["_index_map"] = handle
-        d["_root"] = self._index_map.root
-        return d
+    @overload
+    def __getitem__(self, index: int) -> tuple[str, int]: ...
 
-    def __setstate__(self, state: dict[str, object]) -> None:
-        state["_index_map"] = _rust.FastaMap.from_handle(state["_index_map"], state["_root"])
-        self.__dict__.update(state)
+    @overload
+    def __getitem__(self, index: slice) -> list[tuple[str, int]]: ...
+
+    def __getitem__(self, index: int | slice) -> tuple[str, int] | list[tuple[str, int]]:
+        if isinstance(index, slice):
+            return [
+                (name.decode(), length)
+                for name, length in zip(self._names[index], self._lengths[index].tolist())
+            ]
+        return self._names[index].decode(), int(self._lengths[index])
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        for name, length in zip(self._names, self._lengths.tolist()):
+            yield name.decode(), length
 
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ContigList):
+            return self._names == other._names and np.array_equal(self._lengths, other._lengths)
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return self.to_list() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ContigList({self.to_list()!r})"
+
+    def to_list(self) -> list[tuple[str, int]]:
+        return list(self)
+
+
+class _Loader:
+    _map_type: Any
 
-class TrackLoader:
     def __init__(
         self,
         path: str | Path,
@@ -105,6 +158,7 @@ class TrackLoader:
         show_progress: bool | None = None,
         storage_method: str | None = None,
         names: list[str] | None = None,
+        numa_node: int | None = None,
     ):
         if names is None:
             if no_cache is None:
@@ -121,7 +175,7 @@ class TrackLoader:
             if show_progress is None:
                 show_progress = False
         self._path = str(path)
-        self._index_map = _rust.TrackMap.load(
+        self._index_map = self._map_type.load(
             self._path,
             strict,
             force_build,
@@ -131,31 +185,118 @@ class TrackLoader:
             show_progress,
             storage_method,
             names,
+            numa_node,
         )
+        self._handle_cache: dict[tuple[str, str], int] = {}
+        # The index is immutable, so names and contig lists are computed at most once
+        self._names: NameList | None = None
+        self._contigs_cache: dict[str, ContigList] = {}
 
     @property
-    def names(self) -> list[str]:
-        return self._index_map.names
+    def names(self) -> NameList:
+        if self._names is None:
+            self._names = NameList(self._index_map.names)
+        return self._names
+
+    @property
+    def is_shared(self) -> bool:
+        """Whether pickled copies of this loader share the index memory instead of copying it."""
+        return self._index_map.is_shared
 
-    def contigs(self, name: str) -> list[tuple[str, int]]:
-        return [
-            (contig.decode("utf-8"), length) for contig, length in self._index_map.contigs(name)
-        ]
+    def contigs(self, name: str) -> ContigList:
+        contigs = self._contigs_cache.get(name)
+        if contigs is None:
+            contigs = ContigList(self._index_map.contigs(name))
+            self._contigs_cache[name] = contigs
+        return contigs
+
+    def all_contigs(self) -> dict[str, ContigList]:
+        """Contigs of all names, fetched from the index in a single call."""
+        if len(self._contigs_cache) < len(self.names):
+            self._contigs_cache = {
+                name: ContigList(contigs) for name, contigs in self._index_map.all_contigs()
+            }
+        return {name: self._contigs_cache[name] for name in self.names}
+
+    def contig_handle(self, name: str, contig: str) -> int:
+        # Handles are stable for the lifetime of the index, so memoize them.
+        key = (name, contig)
+        handle = self._handle_cache.get(key)
+        if handle is None:
+            handle = self._index_map.contig_handle(name, contig.encode())
+            self._handle_cache[key] = handle
+        return handle
 
     def read_sequence(self, name: str, contig: str, start: int, length: int) -> np.ndarray:
-        return self._index_map.read_sequence(name, contig.encode(), start, length)
+        return self._index_map.read_sequence_by_handle(
+            self.contig_handle(name, contig), start, length
+        )
+
+    def read_sequence_by_handle(self, handle: int, start: int, length: int) -> np.ndarray:
+        return self._index_map.read_sequence_by_handle(handle, start, length)
+
+    def read_sequences(self, queries: Sequence[tuple[str, str, int, int]]) -> list[np.ndarray]:
+        """Read `(name, contig, start, length)` queries in parallel.
+
+        The reads run on a thread pool of the calling process, which is also safe to use in
+        forked workers.
+        """
+        return self._index_map.read_sequences(
+            [
+                (self.contig_handle(name, contig), start, length)
+                for name, contig, start, length in queries
+            ]
+        )
+
+    def read_windows(self, queries: Sequence[tuple[str, str, int]], length: int) -> np.ndarray:
+        """Read `(name, contig, start)` windows of `length` in parallel into one 2D array.
+
+        Like `read_sequences`, this is safe to call in forked workers.
+        """
+        return self._index_map.read_windows(
+            [(self.contig_handle(name, contig), start) for name, contig, start in queries],
+            length,
+        )
 
     def __getstate__(self) -> dict[str, object]:
         d = self.__dict__.copy()
         handle = self._index_map.handle
         if handle is None:
             raise RuntimeError(
-                "Cannot serialize TrackLoader with non-shared storage (e.g., in-memory storage)!"
+                f"Cannot serialize {type(self).__name__} with non-shared storage "
+                "(e.g., in-memory storage)!"
             )
         d["_index_map"] = handle
         d["_root"] = self._index_map.root
+        # Keep the pickle small, the caches are cheap to rebuild
+        d["_names"] = None
+        d["_contigs_cache"] = {}
         return d
 
+    def __reduce_ex__(self, protocol: int):  # type: ignore[override]
+        reduced = super().__reduce_ex__(protocol)
+        if protocol < 5 or not isinstance(reduced, tuple):
+            return reduced
+        # With protocol 5, let the handle (which contains all data for in-memory storage)
+        # travel as an out-of-band buffer instead of being copied into the pickle stream.
+        func, args, state, *rest = reduced
+        state = {**state, "_index_map": pickle.PickleBuffer(state["_index_map"])}
+        return (func, args, state, *rest)
+
     def __setstate__(self, state: dict[str, object]) -> None:
-        state["_index_map"] = _rust.TrackMap.from_handle(state["_index_map"], state["_root"])
+        state["_index_map"] = self._map_type.from_handle(state["_index_map"], state["_root"])
         self.__dict__.update(state)
+
+
+class FastarLoader(_Loader):
+    _map_type = _rust.FastaMap
+
+
+class TrackLoader(_Loader):
+    _map_type = _rust.TrackMap
+
+    def read_sequence_f32(self, name: str, contig: str, start: int, length: int) -> np.ndarray:
+        """Read `length` float32 values starting at value `start` of the given contig."""
+        return self._index_map.read_sequence_f32_by_handle(
+            self.contig_handle(name, contig), start, length
+        )
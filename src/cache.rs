@@ -21,6 +21,7 @@ pub(crate) trait MapBuilder {
         num_workers: Option<usize>,
         show_progress: bool,
         names_list: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> Result<Self>
     where
         Self: Sized;
@@ -34,6 +35,7 @@ impl MapBuilder for FastaMap {
         num_workers: Option<usize>,
         show_progress: bool,
         names_list: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> Result<Self> {
         FastaMap::build(
             dir,
@@ -42,6 +44,7 @@ impl MapBuilder for FastaMap {
             num_workers,
             show_progress,
             names_list,
+            numa_node,
         )
     }
 }
@@ -54,6 +57,7 @@ impl MapBuilder for TrackMap {
         num_workers: Option<usize>,
         show_progress: bool,
         names_list: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> Result<Self> {
         TrackMap::build(
             dir,
@@ -62,6 +66,7 @@ impl MapBuilder for TrackMap {
             num_workers,
             show_progress,
             names_list,
+            numa_node,
         )
     }
 }
@@ -78,6 +83,7 @@ pub(crate) fn load<T>(
     no_cache: bool,
     force_build: bool,
     names: Option<Vec<String>>,
+    numa_node: Option<usize>,
 ) -> Result<DynamicStorage<T>>
 where
     // Trait bounds for rkyv serialization and deserialization, both to AlignedVec and IoWriter
@@ -167,6 +173,7 @@ where
         num_workers,
         show_progress,
         names,
+        numa_node,
     )?;
     if no_cache {
         if storage_method == "memory" {
@@ -6,3 +6,13 @@ mod track_map;
 
 pub(crate) use fasta_map::FastaMap;
 pub(crate) use track_map::TrackMap;
+
+/// Contig handles pack the position of the name in the map (upper 32 bits)
+/// and the position of the contig within its index (lower 32 bits).
+fn pack_handle(name: u32, contig: u32) -> u64 {
+    (u64::from(name) << 32) | u64::from(contig)
+}
+
+fn unpack_handle(handle: u64) -> (usize, u32) {
+    ((handle >> 32) as usize, handle as u32)
+}
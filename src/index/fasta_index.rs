@@ -4,18 +4,15 @@ use anyhow::Result;
 use noodles::fasta::fai::Index as NoodlesIndex;
 use rkyv::{Archive, Deserialize, Serialize};
 
-#[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
-struct Record {
-    contig: Vec<u8>,
-    length: u64,
-    offset: u64,
-    line_bases: u64,
-    line_width: u64,
-}
-
+/// FASTA index stored as one column per field, so that scanning contig names or lengths
+/// touches only the memory of that field.
 #[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
 pub(super) struct FastaIndex {
-    entries: Vec<Record>,
+    contigs: Vec<Vec<u8>>,
+    lengths: Vec<u64>,
+    offsets: Vec<u64>,
+    line_bases: Vec<u64>,
+    line_widths: Vec<u64>,
 }
 
 impl FastaIndex {
@@ -27,39 +24,65 @@ impl FastaIndex {
 
 impl FastaIndex {
     fn from_noodles(index: &NoodlesIndex, min_contig_length: u64) -> Self {
-        let entries = index
+        let mut fasta_index = FastaIndex {
+            contigs: Vec::new(),
+            lengths: Vec::new(),
+            offsets: Vec::new(),
+            line_bases: Vec::new(),
+            line_widths: Vec::new(),
+        };
+        for record in index
             .as_ref()
             .iter()
-            .map(|record| Record {
-                contig: record.name().to_vec(),
-                length: record.length(),
-                offset: record.offset(),
-                line_bases: record.line_bases(),
-                line_width: record.line_width(),
-            })
-            .filter(|record| record.length >= min_contig_length)
-            .collect();
-        FastaIndex { entries }
+            .filter(|record| record.length() >= min_contig_length)
+        {
+            fasta_index.contigs.push(record.name().to_vec());
+            fasta_index.lengths.push(record.length());
+            fasta_index.offsets.push(record.offset());
+            fasta_index.line_bases.push(record.line_bases());
+            fasta_index.line_widths.push(record.line_width());
+        }
+        fasta_index
     }
 }
 
 impl ArchivedFastaIndex {
-    pub(super) fn contigs(&self) -> Vec<(&[u8], u64)> {
-        self.entries
-            .iter()
-            .map(|record| (record.contig.as_ref(), u64::from(record.length)))
-            .collect()
+    pub(super) fn contigs(&self) -> (Vec<&[u8]>, Vec<u64>) {
+        (
+            self.contigs.iter().map(|contig| contig.as_ref()).collect(),
+            self.lengths
+                .iter()
+                .map(|length| u64::from(*length))
+                .collect(),
+        )
     }
 
-    pub(super) fn query(&self, contig: &[u8], start: u64) -> Result<u64> {
-        self.entries
+    pub(super) fn position(&self, contig: &[u8]) -> Result<u32> {
+        self.contigs
             .iter()
-            .find(|record| record.contig.as_ref() == contig)
+            .position(|name| name.as_ref() == contig)
+            .map(|i| i as u32)
             .ok_or(anyhow::anyhow!("Contig not found"))
-            .map(|record| {
-                record.offset
-                    + start / record.line_bases * record.line_width
-                    + start % record.line_bases
-            })
+    }
+
+    /// Locate `start` within the contig at position `i` in the uncompressed FASTA file.
+    ///
+    /// Returns the byte position together with the line layout `(line_bases, line_width)`.
+    pub(super) fn query(&self, i: u32, start: u64, length: u64) -> Result<(u64, u64, u64)> {
+        let i = i as usize;
+        let contig_length = self
+            .lengths
+            .get(i)
+            .ok_or(anyhow::anyhow!("Invalid contig handle"))?;
+        let line_bases = u64::from(self.line_bases[i]);
+        let line_width = u64::from(self.line_widths[i]);
+        if start + length > u64::from(*contig_length) || line_bases == 0 {
+            anyhow::bail!(
+                "End of file / sequence reached before reading {} nucleotides",
+                length
+            );
+        }
+        let pos = u64::from(self.offsets[i]) + start / line_bases * line_width + start % line_bases;
+        Ok((pos, line_bases, line_width))
     }
 }
@@ -1,24 +1,20 @@
 use crate::index::bgzf_index::BgzfIndex;
 use crate::index::fasta_index::FastaIndex;
-use noodles::{
-    bgzf::{self, io::Seek, VirtualPosition},
-    fasta,
-};
+use crate::index::{pack_handle, unpack_handle};
+use noodles::bgzf::{io::Seek, VirtualPosition};
 
+use anyhow::Context;
 use anyhow::Result;
-use anyhow::{anyhow, Context};
 use indicatif::{ProgressBar, ProgressStyle};
 use numpy::ndarray::Array1;
 use rayon::prelude::*;
 use rkyv::{Archive, Deserialize, Serialize};
-use std::{
-    collections::BTreeMap,
-    fs::File,
-    io::BufRead,
-    path::{Path, PathBuf},
-};
+use std::path::{Path, PathBuf};
 
-use crate::util::get_relative_name_without_suffix;
+use crate::util::{
+    default_num_workers, get_relative_name_without_suffix, open_bgzf, read_fasta_lines_into,
+    thread_pool,
+};
 
 #[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
 struct Index {
@@ -28,7 +24,9 @@ struct Index {
 
 #[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
 pub(crate) struct FastaMap {
-    map: BTreeMap<String, Index>,
+    /// Sorted names, so that a name's position in `names` and `indices` is found by binary search
+    names: Vec<String>,
+    indices: Vec<Index>,
 }
 
 impl FastaMap {
@@ -39,6 +37,7 @@ impl FastaMap {
         num_workers: Option<usize>,
         show_progress: bool,
         names: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> Result<Self> {
         let root_path = Path::new(root);
         let names = match names {
@@ -52,6 +51,7 @@ impl FastaMap {
             Some(names) => names,
         };
         let num_names = names.len();
+        let num_workers = num_workers.or_else(|| default_num_workers(root_path));
 
         // Progress bar setup
         let pb = if show_progress {
@@ -68,7 +68,8 @@ impl FastaMap {
             None
         };
 
-        // Build indices in parallel using rayon. If num_workers is set, use a custom thread pool.
+        // Build indices in parallel using rayon. If num_workers or numa_node
+        // is set, use a custom thread pool.
         let build_indices = || {
             let results: Result<Vec<Option<(String, Index)>>, anyhow::Error> = names
                 .par_iter()
@@ -96,12 +97,8 @@ impl FastaMap {
             results
         };
 
-        let results = if let Some(workers) = num_workers {
-            let pool = rayon::ThreadPoolBuilder::new()
-                .num_threads(workers)
-                .build()
-                .unwrap();
-            pool.install(build_indices)?
+        let results = if num_workers.is_some() || numa_node.is_some() {
+            thread_pool(num_workers, numa_node)?.install(build_indices)?
         } else {
             build_indices()?
         };
@@ -109,80 +106,108 @@ impl FastaMap {
         if let Some(pb) = pb {
             pb.finish_with_message("Indexing complete");
         }
-        let map = results.into_iter().flatten().collect::<BTreeMap<_, _>>();
-        Ok(FastaMap { map })
+        let mut results: Vec<_> = results.into_iter().flatten().collect();
+        results.sort_unstable_by(|(a, _), (b, _)| a.cmp(b));
+        // A user-supplied list of names may contain duplicates
+        results.dedup_by(|(a, _), (b, _)| a == b);
+        let (names, indices) = results.into_iter().unzip();
+        Ok(FastaMap { names, indices })
     }
 
     fn index_name(name: &str, root: &Path, min_contig_length: u64) -> Result<Index> {
-        let gzi = BgzfIndex::read(root.join(format!("{}.fna.gz.gzi", name)))
-            .context("Failed to read .gzi")?;
-        let fai = FastaIndex::read(root.join(format!("{}.fna.gz.fai", name)), min_contig_length)
-            .context("Failed to read .fai")?;
+        // Read both index files of an assembly concurrently, which helps when there are fewer
+        // assemblies than workers.
+        let (gzi, fai) = rayon::join(
+            || BgzfIndex::read(root.join(format!("{}.fna.gz.gzi", name))),
+            || FastaIndex::read(root.join(format!("{}.fna.gz.fai", name)), min_contig_length),
+        );
+        let gzi = gzi.context("Failed to read .gzi")?;
+        let fai = fai.context("Failed to read .fai")?;
         Ok(Index { gzi, fai })
     }
 }
 
 impl ArchivedFastaMap {
     pub(crate) fn names(&self) -> Vec<&str> {
-        self.map.keys().map(|s| s.as_str()).collect()
+        self.names.iter().map(|s| s.as_str()).collect()
     }
 
-    pub(crate) fn contigs(&self, name: &str) -> Result<Vec<(&[u8], u64)>> {
-        let entry = self
-            .map
-            .get(name)
+    fn position(&self, name: &str) -> Option<u32> {
+        self.names
+            .binary_search_by(|s| s.as_str().cmp(name))
+            .ok()
+            .map(|i| i as u32)
+    }
+
+    pub(crate) fn contigs(&self, name: &str) -> Result<(Vec<&[u8]>, Vec<u64>)> {
+        let i = self
+            .position(name)
             .ok_or(anyhow::anyhow!(format!("Fasta name not found: {}", name)))?;
-        Ok(entry.fai.contigs())
+        Ok(self.indices[i as usize].fai.contigs())
+    }
+
+    /// Contigs of all names, in the order of `names()`.
+    pub(crate) fn all_contigs(&self) -> Vec<(&str, (Vec<&[u8]>, Vec<u64>))> {
+        self.names
+            .iter()
+            .zip(self.indices.iter())
+            .map(|(name, index)| (name.as_str(), index.fai.contigs()))
+            .collect()
+    }
+
+    pub(crate) fn contig_handle(&self, fasta_name: &str, contig: &[u8]) -> Result<u64> {
+        let i = self
+            .position(fasta_name)
+            .ok_or(anyhow::anyhow!("Fasta name not found"))?;
+        let j = self.indices[i as usize].fai.position(contig)?;
+        Ok(pack_handle(i, j))
     }
 
     pub(crate) fn query(
         &self,
         root: &str,
-        fasta_name: &str,
-        contig: &[u8],
+        handle: u64,
         start: u64,
-    ) -> Result<(PathBuf, VirtualPosition)> {
+        length: u64,
+    ) -> Result<(PathBuf, VirtualPosition, u64, u64)> {
         // Search in index
+        let (i, j) = unpack_handle(handle);
         let entry = self
-            .map
-            .get(fasta_name)
-            .ok_or(anyhow::anyhow!("Fasta name not found"))?;
-        let pos = entry.fai.query(contig, start)?;
+            .indices
+            .get(i)
+            .ok_or(anyhow::anyhow!("Invalid contig handle"))?;
+        let (pos, line_bases, line_width) = entry.fai.query(j, start, length)?;
         let offset = entry.gzi.query(pos)?;
-        let path = Path::new(root).join(format!("{}.fna.gz", fasta_name));
-        Ok((path, offset))
+        let path = Path::new(root).join(format!("{}.fna.gz", self.names[i].as_str()));
+        Ok((path, offset, line_bases, line_width))
     }
 
     pub(crate) fn read_sequence(
         &self,
         root: &str,
-        fasta_name: &str,
-        contig: &[u8],
+        handle: u64,
         start: u64,
         length: u64,
     ) -> Result<Array1<u8>> {
-        let (path, pos) = self.query(root, fasta_name, contig, start)?;
-
-        // Open FASTA sequence reader at correct offset
-        let mut bgzf_reader = bgzf::io::Reader::new(File::open(path)?);
-        bgzf_reader.seek_to_virtual_position(pos)?;
-        let mut fasta_reader = fasta::io::Reader::new(bgzf_reader);
-        let mut sequence_reader = fasta_reader.sequence_reader();
-
-        // Read until we have the desired number of nucleotides
-        let mut buf = Vec::with_capacity(length as usize);
-        while buf.len() < length as usize {
-            let src = sequence_reader.fill_buf()?;
-            if src.is_empty() {
-                return Err(anyhow!(
-                    "End of file / sequence reached before reading {} nucleotides",
-                    length
-                ));
-            }
-            let i = (length as usize - buf.len()).min(src.len());
-            buf.extend_from_slice(&src[..i]);
-            sequence_reader.consume(i);
-        }
+        let mut buf = vec![0; length as usize];
+        self.read_sequence_into(root, handle, start, &mut buf)?;
         Ok(buf.into())
     }
+
+    pub(crate) fn read_sequence_into(
+        &self,
+        root: &str,
+        handle: u64,
+        start: u64,
+        buf: &mut [u8],
+    ) -> Result<()> {
+        let (path, pos, line_bases, line_width) =
+            self.query(root, handle, start, buf.len() as u64)?;
+
+        // Open BGZF reader at correct offset
+        let mut reader = open_bgzf(path)?;
+        reader.seek_to_virtual_position(pos)?;
+
+        read_fasta_lines_into(&mut reader, start, line_bases, line_width, buf)
+    }
 }
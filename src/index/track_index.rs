@@ -7,16 +7,13 @@ use std::{
 use anyhow::Result;
 use rkyv::{Archive, Deserialize, Serialize};
 
-#[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
-struct TrackIndexRecord {
-    name: Vec<u8>,
-    offset: u64,
-    length: u64,
-}
-
+/// Track index stored as one column per field, so that scanning contig names or lengths
+/// touches only the memory of that field.
 #[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
 pub(super) struct TrackIndex {
-    entries: Vec<TrackIndexRecord>,
+    names: Vec<Vec<u8>>,
+    offsets: Vec<u64>,
+    lengths: Vec<u64>,
 }
 
 impl TrackIndex {
@@ -47,45 +44,54 @@ impl TrackIndex {
         }
 
         // Create entries by computing length of neighboring offsets
-        let entries = entries
-            .windows(2)
-            .map(|pair| {
-                if let [(Some(name), offset), (_, next_offset)] = pair {
-                    Ok(TrackIndexRecord {
-                        name: name.clone(),
-                        offset: *offset,
-                        length: next_offset - offset,
-                    })
-                } else {
-                    Err(anyhow::anyhow!("Invalid track index format"))
+        let mut index = TrackIndex {
+            names: Vec::new(),
+            offsets: Vec::new(),
+            lengths: Vec::new(),
+        };
+        for pair in entries.windows(2) {
+            if let [(Some(name), offset), (_, next_offset)] = pair {
+                let length = next_offset - offset;
+                if length >= min_contig_length {
+                    index.names.push(name.clone());
+                    index.offsets.push(*offset);
+                    index.lengths.push(length);
                 }
-            })
-            .filter(|r| match r {
-                Ok(record) => record.length >= min_contig_length,
-                Err(_) => true,
-            })
-            .collect::<Result<Vec<_>>>()?;
+            } else {
+                return Err(anyhow::anyhow!("Invalid track index format"));
+            }
+        }
 
-        Ok(TrackIndex { entries })
+        Ok(index)
     }
 }
 
 impl ArchivedTrackIndex {
-    pub(super) fn contigs(&self) -> Vec<(&[u8], u64)> {
-        self.entries
-            .iter()
-            .map(|entry| (&entry.name[..], u64::from(entry.length)))
-            .collect()
+    pub(super) fn contigs(&self) -> (Vec<&[u8]>, Vec<u64>) {
+        (
+            self.names.iter().map(|name| &name[..]).collect(),
+            self.lengths
+                .iter()
+                .map(|length| u64::from(*length))
+                .collect(),
+        )
     }
 
-    pub(super) fn query(&self, name: &[u8], start: u64) -> Result<u64> {
-        let i = self.entries.iter().find(|r| r.name.as_slice() == name);
-        match i {
-            Some(entry) => Ok(u64::from(entry.offset) + start),
-            None => Err(anyhow::anyhow!(
+    pub(super) fn position(&self, name: &[u8]) -> Result<u32> {
+        self.names
+            .iter()
+            .position(|n| n.as_slice() == name)
+            .map(|i| i as u32)
+            .ok_or(anyhow::anyhow!(
                 "Track not found: {}",
                 String::from_utf8_lossy(name)
-            )),
+            ))
+    }
+
+    pub(super) fn query(&self, i: u32, start: u64) -> Result<u64> {
+        match self.offsets.get(i as usize) {
+            Some(offset) => Ok(u64::from(*offset) + start),
+            None => Err(anyhow::anyhow!("Invalid contig handle")),
         }
     }
 }
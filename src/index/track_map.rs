@@ -1,7 +1,8 @@
 use crate::index::bgzf_index::BgzfIndex;
-use crate::util::get_relative_name_without_suffix;
+use crate::index::{pack_handle, unpack_handle};
+use crate::util::{default_num_workers, get_relative_name_without_suffix, open_bgzf, thread_pool};
 use anyhow::Context;
-use noodles::bgzf::{self, io::Seek, VirtualPosition};
+use noodles::bgzf::{io::Seek, VirtualPosition};
 
 use anyhow::Result;
 use indicatif::{ProgressBar, ProgressStyle};
@@ -9,11 +10,7 @@ use numpy::ndarray::Array1;
 use rayon::prelude::*;
 use rkyv::{Archive, Deserialize, Serialize};
 use std::io::Read;
-use std::{
-    collections::BTreeMap,
-    fs::File,
-    path::{Path, PathBuf},
-};
+use std::path::{Path, PathBuf};
 
 use super::track_index::TrackIndex;
 
@@ -25,7 +22,9 @@ struct Index {
 
 #[derive(Archive, Serialize, Deserialize, Debug, PartialEq, Clone)]
 pub(crate) struct TrackMap {
-    map: BTreeMap<String, Index>,
+    /// Sorted names, so that a name's position in `names` and `indices` is found by binary search
+    names: Vec<String>,
+    indices: Vec<Index>,
 }
 
 impl TrackMap {
@@ -36,6 +35,7 @@ impl TrackMap {
         num_workers: Option<usize>,
         show_progress: bool,
         names: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> Result<Self> {
         let root_path = Path::new(root);
         let names = match names {
@@ -49,6 +49,7 @@ impl TrackMap {
             Some(names) => names,
         };
         let num_names = names.len();
+        let num_workers = num_workers.or_else(|| default_num_workers(root_path));
 
         // Progress bar setup
         let pb = if show_progress {
@@ -65,7 +66,8 @@ impl TrackMap {
             None
         };
 
-        // Build indices in parallel using rayon. If num_workers is set, use a custom thread pool.
+        // Build indices in parallel using rayon. If num_workers or numa_node
+        // is set, use a custom thread pool.
         let build_indices = || {
             let results: Result<Vec<Option<(String, Index)>>, anyhow::Error> = names
                 .par_iter()
@@ -93,12 +95,8 @@ impl TrackMap {
             results
         };
 
-        let results = if let Some(workers) = num_workers {
-            let pool = rayon::ThreadPoolBuilder::new()
-                .num_threads(workers)
-                .build()
-                .unwrap();
-            pool.install(build_indices)?
+        let results = if num_workers.is_some() || numa_node.is_some() {
+            thread_pool(num_workers, numa_node)?.install(build_indices)?
         } else {
             build_indices()?
         };
@@ -106,8 +104,12 @@ impl TrackMap {
         if let Some(pb) = pb {
             pb.finish_with_message("Indexing complete");
         }
-        let map = results.into_iter().flatten().collect::<BTreeMap<_, _>>();
-        Ok(TrackMap { map })
+        let mut results: Vec<_> = results.into_iter().flatten().collect();
+        results.sort_unstable_by(|(a, _), (b, _)| a.cmp(b));
+        // A user-supplied list of names may contain duplicates
+        results.dedup_by(|(a, _), (b, _)| a == b);
+        let (names, indices) = results.into_iter().unzip();
+        Ok(TrackMap { names, indices })
     }
 
     fn index_name(name: &str, root: &Path, min_contig_length: u64) -> Result<Index> {
@@ -124,48 +126,104 @@ impl TrackMap {
 
 impl ArchivedTrackMap {
     pub(crate) fn names(&self) -> Vec<&str> {
-        self.map.keys().map(|s| s.as_str()).collect()
+        self.names.iter().map(|s| s.as_str()).collect()
     }
 
-    pub(crate) fn contigs(&self, track_name: &str) -> Result<Vec<(&[u8], u64)>> {
-        let entry = self.map.get(track_name).ok_or(anyhow::anyhow!(format!(
+    fn position(&self, name: &str) -> Option<u32> {
+        self.names
+            .binary_search_by(|s| s.as_str().cmp(name))
+            .ok()
+            .map(|i| i as u32)
+    }
+
+    pub(crate) fn contigs(&self, track_name: &str) -> Result<(Vec<&[u8]>, Vec<u64>)> {
+        let i = self.position(track_name).ok_or(anyhow::anyhow!(format!(
             "Track name not found: {}",
             track_name
         )))?;
-        Ok(entry.track_index.contigs())
+        Ok(self.indices[i as usize].track_index.contigs())
+    }
+
+    /// Contigs of all names, in the order of `names()`.
+    pub(crate) fn all_contigs(&self) -> Vec<(&str, (Vec<&[u8]>, Vec<u64>))> {
+        self.names
+            .iter()
+            .zip(self.indices.iter())
+            .map(|(name, index)| (name.as_str(), index.track_index.contigs()))
+            .collect()
+    }
+
+    pub(crate) fn contig_handle(&self, track_name: &str, contig: &[u8]) -> Result<u64> {
+        let i = self
+            .position(track_name)
+            .ok_or(anyhow::anyhow!("Name not found"))?;
+        let j = self.indices[i as usize].track_index.position(contig)?;
+        Ok(pack_handle(i, j))
     }
 
     pub(crate) fn query(
         &self,
         root: &str,
-        track_name: &str,
-        contig: &[u8],
+        handle: u64,
         start: u64,
     ) -> Result<(PathBuf, VirtualPosition)> {
         // Search in index
+        let (i, j) = unpack_handle(handle);
         let entry = self
-            .map
-            .get(track_name)
-            .ok_or(anyhow::anyhow!("Name not found"))?;
-        let pos = entry.track_index.query(contig, start)?;
+            .indices
+            .get(i)
+            .ok_or(anyhow::anyhow!("Invalid contig handle"))?;
+        let pos = entry.track_index.query(j, start)?;
         let offset = entry.gzi.query(pos)?;
-        let path = Path::new(root).join(format!("{}.track.gz", track_name));
+        let path = Path::new(root).join(format!("{}.track.gz", self.names[i].as_str()));
         Ok((path, offset))
     }
 
     pub(crate) fn read_sequence(
         &self,
         root: &str,
-        track_name: &str,
-        contig: &[u8],
+        handle: u64,
         start: u64,
         length: u64,
     ) -> Result<Array1<u8>> {
-        let (path, pos) = self.query(root, track_name, contig, start)?;
-        let mut reader = bgzf::io::Reader::new(File::open(path)?);
-        reader.seek_to_virtual_position(pos)?;
         let mut byte_buffer = vec![0; length as usize];
-        reader.read_exact(&mut byte_buffer)?;
+        self.read_sequence_into(root, handle, start, &mut byte_buffer)?;
         Ok(Array1::from(byte_buffer))
     }
+
+    /// Read `length` float32 values starting at value `start`.
+    ///
+    /// The values are read directly into a `Vec<f32>`, so the result is properly aligned.
+    pub(crate) fn read_sequence_f32(
+        &self,
+        root: &str,
+        handle: u64,
+        start: u64,
+        length: u64,
+    ) -> Result<Array1<f32>> {
+        let mut values = vec![0f32; length as usize];
+        // Safety: f32 has no invalid bit patterns and the byte slice covers exactly `values`
+        let bytes = unsafe {
+            std::slice::from_raw_parts_mut(
+                values.as_mut_ptr() as *mut u8,
+                std::mem::size_of_val(values.as_slice()),
+            )
+        };
+        self.read_sequence_into(root, handle, start * 4, bytes)?;
+        Ok(Array1::from(values))
+    }
+
+    pub(crate) fn read_sequence_into(
+        &self,
+        root: &str,
+        handle: u64,
+        start: u64,
+        buf: &mut [u8],
+    ) -> Result<()> {
+        let (path, pos) = self.query(root, handle, start)?;
+        let mut reader = open_bgzf(path)?;
+        reader.seek_to_virtual_position(pos)?;
+        reader.read_exact(buf)?;
+        Ok(())
+    }
 }
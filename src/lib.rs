@@ -3,51 +3,127 @@ mod index;
 mod storage;
 mod util;
 
-use anyhow::Result;
+use anyhow::{Context, Result};
 use index::{FastaMap, TrackMap};
-use noodles::bgzf;
-use noodles::core::{Position, Region};
+use noodles::bgzf::{self, io::Seek};
 use noodles::fasta;
-use numpy::ndarray::Array1;
-use numpy::{IntoPyArray, PyArray1};
-use pyo3::{exceptions::PyRuntimeError, prelude::*};
+use numpy::ndarray::{Array1, Array2};
+use numpy::{IntoPyArray, PyArray1, PyArray2};
+use pyo3::{buffer::PyBuffer, exceptions::PyRuntimeError, prelude::*};
+use rayon::prelude::*;
 
 use crate::storage::DynamicStorage;
+use crate::util::{
+    cached_index, mapped_file, open_bgzf, read_bgzf_range, read_fasta_lines_into, with_process_pool,
+};
+
+/// Minimum size of an uncompressed region (a few BGZF blocks) to decode its blocks in parallel.
+const PARALLEL_DECODE_THRESHOLD: u64 = 1 << 20;
+
+/// First bytes of a gzip (and thus BGZF) file.
+const GZIP_MAGIC: [u8; 2] = [0x1f, 0x8b];
 
 #[pyfunction]
 fn read_sequence<'py>(
     py: Python<'py>,
     fasta_path: &str,
-    gzi_path: &str,
+    gzi_path: Option<&str>,
     fai_path: &str,
     chromosome: &str,
     start: usize,
     length: usize,
 ) -> PyResult<Bound<'py, PyArray1<u8>>> {
-    read_sequence_(fasta_path, gzi_path, fai_path, chromosome, start, length)
+    py.detach(|| read_sequence_(fasta_path, gzi_path, fai_path, chromosome, start, length))
         .map(|arr| arr.into_pyarray(py))
         .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
 }
 
+#[pyfunction]
+fn read_sequences<'py>(
+    py: Python<'py>,
+    fasta_path: &str,
+    gzi_path: Option<&str>,
+    fai_path: &str,
+    queries: Vec<(String, usize, usize)>,
+) -> PyResult<Vec<Bound<'py, PyArray1<u8>>>> {
+    py.detach(|| {
+        with_process_pool(|| {
+            queries
+                .par_iter()
+                .map(|(chromosome, start, length)| {
+                    read_sequence_(fasta_path, gzi_path, fai_path, chromosome, *start, *length)
+                })
+                .collect::<Result<Vec<_>>>()
+        })?
+    })
+    .map(|arrs| arrs.into_iter().map(|arr| arr.into_pyarray(py)).collect())
+    .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+}
+
+/// Read a sequence from a BGZF-compressed or an uncompressed FASTA file.
+///
+/// If `gzi_path` is `None`, compressed files use the `.gzi` index next to the FASTA file.
 fn read_sequence_(
     fasta_path: &str,
-    gzi_path: &str,
+    gzi_path: Option<&str>,
     fai_path: &str,
     chromosome: &str,
     start: usize,
     length: usize,
 ) -> Result<Array1<u8>> {
-    let bgzf_reader = bgzf::io::indexed_reader::Builder::default()
-        .set_index(bgzf::gzi::fs::read(gzi_path)?)
-        .build_from_path(fasta_path)?;
-    let mut fasta_reader = fasta::io::indexed_reader::Builder::default()
-        .set_index(fasta::fai::fs::read(fai_path)?)
-        .build_from_reader(bgzf_reader)?;
-    let start_pos = Position::try_from(start + 1)?;
-    let end_pos = Position::try_from(start + length)?;
-    let region = Region::new(chromosome, start_pos..=end_pos);
-    let record = fasta_reader.query(&region)?;
-    let sequence = record.sequence().as_ref().to_vec();
+    let index = cached_index(fai_path, fasta::fai::fs::read)?;
+    let records: &[fasta::fai::Record] = (*index).as_ref();
+    let record = records
+        .iter()
+        .find(|record| record.name() == chromosome.as_bytes())
+        .ok_or(anyhow::anyhow!("Contig not found"))?;
+    let (start, line_bases, line_width) = (start as u64, record.line_bases(), record.line_width());
+    if start + length as u64 > record.length() || line_bases == 0 {
+        anyhow::bail!(
+            "End of file / sequence reached before reading {} nucleotides",
+            length
+        );
+    }
+    let position = |base: u64| record.offset() + base / line_bases * line_width + base % line_bases;
+    let pos = position(start);
+
+    let mut sequence = vec![0; length];
+    // Without a .gzi index, tell compressed from uncompressed files by their first bytes.
+    // Uncompressed files are mapped once per process and copied from directly.
+    let mmap = match gzi_path {
+        Some(_) => None,
+        None => Some(mapped_file(fasta_path)?).filter(|mmap| !mmap.starts_with(&GZIP_MAGIC)),
+    };
+    match mmap {
+        Some(mmap) => {
+            let mut data = mmap.get(pos as usize..).ok_or(anyhow::anyhow!(
+                "FASTA index points past the end of the file"
+            ))?;
+            read_fasta_lines_into(&mut data, start, line_bases, line_width, &mut sequence)?;
+        }
+        None => {
+            let gzi_path = gzi_path.map_or_else(|| format!("{}.gzi", fasta_path), str::to_string);
+            let gzi = cached_index(&gzi_path, bgzf::gzi::fs::read)
+                .with_context(|| format!("Could not read BGZF index {}", gzi_path))?;
+            // Byte position right after the last requested base
+            let end_pos = position(start + length.max(1) as u64 - 1) + 1;
+            if end_pos - pos >= PARALLEL_DECODE_THRESHOLD {
+                // Long reads span many BGZF blocks, so decode them in parallel
+                let data = read_bgzf_range(fasta_path, (*gzi).as_ref(), pos, end_pos)?;
+                read_fasta_lines_into(
+                    &mut &data[..],
+                    start,
+                    line_bases,
+                    line_width,
+                    &mut sequence,
+                )?;
+            } else {
+                let mut reader = open_bgzf(fasta_path)?;
+                reader.seek_to_virtual_position(gzi.query(pos)?)?;
+                read_fasta_lines_into(&mut reader, start, line_bases, line_width, &mut sequence)?;
+            }
+        }
+    }
     Ok(sequence.into())
 }
 
@@ -72,6 +148,7 @@ impl PyFastaMap {
         show_progress: bool,
         storage_method: &str,
         names_list: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> PyResult<Self> {
         py.detach(|| {
             cache::load::<FastaMap>(
@@ -85,6 +162,7 @@ impl PyFastaMap {
                 no_cache,
                 force_build,
                 names_list,
+                numa_node,
             )
         })
         .map(|storage| PyFastaMap {
@@ -105,8 +183,15 @@ impl PyFastaMap {
         Ok(&self.root)
     }
 
+    #[getter]
+    fn is_shared(&self) -> bool {
+        self.storage.is_shared()
+    }
+
     #[staticmethod]
-    fn from_handle(handle: Vec<u8>, root: &str) -> PyResult<Self> {
+    fn from_handle(py: Python, handle: PyBuffer<u8>, root: &str) -> PyResult<Self> {
+        // Accept any buffer, e.g. out-of-band pickle buffers, not just bytes
+        let handle = handle.to_vec(py)?;
         DynamicStorage::<FastaMap>::import(handle)
             .map(|storage| PyFastaMap {
                 storage,
@@ -120,11 +205,39 @@ impl PyFastaMap {
         Ok(self.storage.as_ref().names())
     }
 
-    fn contigs(&self, fasta_name: &str) -> PyResult<Vec<(&[u8], u64)>> {
-        self.storage
+    /// Returns the contig names and a NumPy array of their lengths.
+    fn contigs<'py>(
+        &self,
+        py: Python<'py>,
+        fasta_name: &str,
+    ) -> PyResult<(Vec<&[u8]>, Bound<'py, PyArray1<u64>>)> {
+        let (contigs, lengths) = self
+            .storage
             .as_ref()
             .contigs(fasta_name)
-            .map_err(|e| PyRuntimeError::new_err(format!("Error getting contigs: {:?}", e)))
+            .map_err(|e| PyRuntimeError::new_err(format!("Error getting contigs: {:?}", e)))?;
+        Ok((contigs, lengths.into_pyarray(py)))
+    }
+
+    /// Returns the contigs of all names in one call, see `contigs`.
+    #[allow(clippy::type_complexity)]
+    fn all_contigs<'py>(
+        &self,
+        py: Python<'py>,
+    ) -> Vec<(&str, (Vec<&[u8]>, Bound<'py, PyArray1<u64>>))> {
+        self.storage
+            .as_ref()
+            .all_contigs()
+            .into_iter()
+            .map(|(name, (contigs, lengths))| (name, (contigs, lengths.into_pyarray(py))))
+            .collect()
+    }
+
+    fn contig_handle(&self, fasta_name: &str, contig: &[u8]) -> PyResult<u64> {
+        self.storage
+            .as_ref()
+            .contig_handle(fasta_name, contig)
+            .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
     }
 
     fn read_sequence<'py>(
@@ -134,11 +247,72 @@ impl PyFastaMap {
         contig: &[u8],
         start: u64,
         length: u64,
+    ) -> PyResult<Bound<'py, PyArray1<u8>>> {
+        py.detach(|| {
+            let map = self.storage.as_ref();
+            let handle = map.contig_handle(fasta_name, contig)?;
+            map.read_sequence(&self.root, handle, start, length)
+        })
+        .map(|arr| arr.into_pyarray(py))
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_sequence_by_handle<'py>(
+        &self,
+        py: Python<'py>,
+        handle: u64,
+        start: u64,
+        length: u64,
     ) -> PyResult<Bound<'py, PyArray1<u8>>> {
         py.detach(|| {
             self.storage
                 .as_ref()
-                .read_sequence(&self.root, fasta_name, contig, start, length)
+                .read_sequence(&self.root, handle, start, length)
+        })
+        .map(|arr| arr.into_pyarray(py))
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_sequences<'py>(
+        &self,
+        py: Python<'py>,
+        queries: Vec<(u64, u64, u64)>,
+    ) -> PyResult<Vec<Bound<'py, PyArray1<u8>>>> {
+        py.detach(|| {
+            with_process_pool(|| {
+                queries
+                    .par_iter()
+                    .map(|&(handle, start, length)| {
+                        self.storage
+                            .as_ref()
+                            .read_sequence(&self.root, handle, start, length)
+                    })
+                    .collect::<Result<Vec<_>>>()
+            })?
+        })
+        .map(|arrs| arrs.into_iter().map(|arr| arr.into_pyarray(py)).collect())
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_windows<'py>(
+        &self,
+        py: Python<'py>,
+        queries: Vec<(u64, u64)>,
+        length: usize,
+    ) -> PyResult<Bound<'py, PyArray2<u8>>> {
+        py.detach(|| -> Result<Array2<u8>> {
+            // Fill one contiguous buffer, one row per query
+            let mut buf = vec![0; queries.len() * length];
+            with_process_pool(|| {
+                buf.par_chunks_mut(length.max(1))
+                    .zip(queries.par_iter())
+                    .try_for_each(|(row, &(handle, start))| {
+                        self.storage
+                            .as_ref()
+                            .read_sequence_into(&self.root, handle, start, row)
+                    })
+            })??;
+            Ok(Array2::from_shape_vec((queries.len(), length), buf)?)
         })
         .map(|arr| arr.into_pyarray(py))
         .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
@@ -166,6 +340,7 @@ impl PyTrackMap {
         show_progress: bool,
         storage_method: &str,
         names: Option<Vec<String>>,
+        numa_node: Option<usize>,
     ) -> PyResult<Self> {
         py.detach(|| {
             cache::load::<TrackMap>(
@@ -179,6 +354,7 @@ impl PyTrackMap {
                 no_cache,
                 force_build,
                 names,
+                numa_node,
             )
         })
         .map(|storage| PyTrackMap {
@@ -199,8 +375,15 @@ impl PyTrackMap {
         Ok(&self.root)
     }
 
+    #[getter]
+    fn is_shared(&self) -> bool {
+        self.storage.is_shared()
+    }
+
     #[staticmethod]
-    fn from_handle(handle: Vec<u8>, root: &str) -> PyResult<Self> {
+    fn from_handle(py: Python, handle: PyBuffer<u8>, root: &str) -> PyResult<Self> {
+        // Accept any buffer, e.g. out-of-band pickle buffers, not just bytes
+        let handle = handle.to_vec(py)?;
         DynamicStorage::<TrackMap>::import(handle)
             .map(|storage| PyTrackMap {
                 storage,
@@ -214,11 +397,39 @@ impl PyTrackMap {
         Ok(self.storage.as_ref().names())
     }
 
-    fn contigs(&self, fasta_name: &str) -> PyResult<Vec<(&[u8], u64)>> {
-        self.storage
+    /// Returns the contig names and a NumPy array of their lengths.
+    fn contigs<'py>(
+        &self,
+        py: Python<'py>,
+        fasta_name: &str,
+    ) -> PyResult<(Vec<&[u8]>, Bound<'py, PyArray1<u64>>)> {
+        let (contigs, lengths) = self
+            .storage
             .as_ref()
             .contigs(fasta_name)
-            .map_err(|e| PyRuntimeError::new_err(format!("Error getting contigs: {:?}", e)))
+            .map_err(|e| PyRuntimeError::new_err(format!("Error getting contigs: {:?}", e)))?;
+        Ok((contigs, lengths.into_pyarray(py)))
+    }
+
+    /// Returns the contigs of all names in one call, see `contigs`.
+    #[allow(clippy::type_complexity)]
+    fn all_contigs<'py>(
+        &self,
+        py: Python<'py>,
+    ) -> Vec<(&str, (Vec<&[u8]>, Bound<'py, PyArray1<u64>>))> {
+        self.storage
+            .as_ref()
+            .all_contigs()
+            .into_iter()
+            .map(|(name, (contigs, lengths))| (name, (contigs, lengths.into_pyarray(py))))
+            .collect()
+    }
+
+    fn contig_handle(&self, track_name: &str, contig: &[u8]) -> PyResult<u64> {
+        self.storage
+            .as_ref()
+            .contig_handle(track_name, contig)
+            .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
     }
 
     fn read_sequence<'py>(
@@ -229,10 +440,87 @@ impl PyTrackMap {
         start: u64,
         length: u64,
     ) -> PyResult<Bound<'py, PyArray1<u8>>> {
+        py.detach(|| {
+            let map = self.storage.as_ref();
+            let handle = map.contig_handle(track_name, contig)?;
+            map.read_sequence(&self.root, handle, start, length)
+        })
+        .map(|arr| arr.into_pyarray(py))
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_sequence_by_handle<'py>(
+        &self,
+        py: Python<'py>,
+        handle: u64,
+        start: u64,
+        length: u64,
+    ) -> PyResult<Bound<'py, PyArray1<u8>>> {
+        py.detach(|| {
+            self.storage
+                .as_ref()
+                .read_sequence(&self.root, handle, start, length)
+        })
+        .map(|arr| arr.into_pyarray(py))
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_sequence_f32_by_handle<'py>(
+        &self,
+        py: Python<'py>,
+        handle: u64,
+        start: u64,
+        length: u64,
+    ) -> PyResult<Bound<'py, PyArray1<f32>>> {
         py.detach(|| {
             self.storage
                 .as_ref()
-                .read_sequence(&self.root, track_name, contig, start, length)
+                .read_sequence_f32(&self.root, handle, start, length)
+        })
+        .map(|arr| arr.into_pyarray(py))
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_sequences<'py>(
+        &self,
+        py: Python<'py>,
+        queries: Vec<(u64, u64, u64)>,
+    ) -> PyResult<Vec<Bound<'py, PyArray1<u8>>>> {
+        py.detach(|| {
+            with_process_pool(|| {
+                queries
+                    .par_iter()
+                    .map(|&(handle, start, length)| {
+                        self.storage
+                            .as_ref()
+                            .read_sequence(&self.root, handle, start, length)
+                    })
+                    .collect::<Result<Vec<_>>>()
+            })?
+        })
+        .map(|arrs| arrs.into_iter().map(|arr| arr.into_pyarray(py)).collect())
+        .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
+    }
+
+    fn read_windows<'py>(
+        &self,
+        py: Python<'py>,
+        queries: Vec<(u64, u64)>,
+        length: usize,
+    ) -> PyResult<Bound<'py, PyArray2<u8>>> {
+        py.detach(|| -> Result<Array2<u8>> {
+            // Fill one contiguous buffer, one row per query
+            let mut buf = vec![0; queries.len() * length];
+            with_process_pool(|| {
+                buf.par_chunks_mut(length.max(1))
+                    .zip(queries.par_iter())
+                    .try_for_each(|(row, &(handle, start))| {
+                        self.storage
+                            .as_ref()
+                            .read_sequence_into(&self.root, handle, start, row)
+                    })
+            })??;
+            Ok(Array2::from_shape_vec((queries.len(), length), buf)?)
         })
         .map(|arr| arr.into_pyarray(py))
         .map_err(|e| PyRuntimeError::new_err(format!("{:?}", e)))
@@ -242,6 +530,7 @@ impl PyTrackMap {
 #[pymodule]
 fn fastar_loader(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_wrapped(wrap_pyfunction!(read_sequence))?;
+    m.add_wrapped(wrap_pyfunction!(read_sequences))?;
     m.add_class::<PyFastaMap>()?;
     m.add_class::<PyTrackMap>()?;
     Ok(())
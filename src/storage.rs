@@ -60,6 +60,11 @@ where
         }
     }
 
+    /// Whether other processes attach to the same memory on import instead of copying it.
+    pub fn is_shared(&self) -> bool {
+        !matches!(self, DynamicStorage::Memory(_))
+    }
+
     pub fn export(&self) -> Option<Vec<u8>> {
         fn prefix(storage_type: &str, id: Vec<u8>) -> Vec<u8> {
             let mut result = storage_type.as_bytes().to_vec();
@@ -43,6 +43,8 @@ pub(crate) trait LoadableStorage: Storage {
     fn load(path: &Path) -> Result<Self>
     where
         Self: Sized;
+    /// Hint that all data is about to be read, e.g. for checksum verification.
+    fn will_read_all(&self) {}
 }
 
 pub(crate) struct ArchiveStorage<T, S> {
@@ -197,6 +199,7 @@ where
         }
 
         // Verify checksum
+        storage.will_read_all();
         let checksum_read = u32::from_le_bytes(checksum_bytes_slice.try_into().unwrap());
         let checksum_calculated = crc32fast::hash(data_bytes_slice);
         if checksum_read != checksum_calculated {
@@ -358,9 +361,13 @@ pub(crate) fn load_bytes<S: MutableStorage>(path: &Path) -> Result<S> {
     Ok(storage)
 }
 
+// Bump this whenever the archived layout of the maps changes, so that stale caches are rejected.
+const FORMAT_VERSION: u64 = 3;
+
 pub(crate) fn type_specific_magic<T: 'static>() -> u64 {
     let mut hasher = DefaultHasher::new();
     TypeId::of::<T>().hash(&mut hasher);
+    FORMAT_VERSION.hash(&mut hasher);
     hasher.finish()
 }
 
@@ -376,7 +383,8 @@ mod tests {
 
     #[test]
     fn test_create() {
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         let container: ArchiveStorage<FastaMap, MemoryStorage> = ArchiveStorage::new(data).unwrap();
         let reference = container.as_ref();
         reference.names();
@@ -384,7 +392,8 @@ mod tests {
 
     #[test]
     fn test_invalid_magic_shmem() {
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         let container: ArchiveStorage<FastaMap, ShmemStorage> = ArchiveStorage::new(data).unwrap();
         let handle = container.export();
         let os_id = String::from_utf8(handle.clone()).unwrap();
@@ -400,7 +409,8 @@ mod tests {
 
     #[test]
     fn test_from_os_id() {
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         let container: ArchiveStorage<FastaMap, ShmemStorage> = ArchiveStorage::new(data).unwrap();
         let os_id = container.export();
         let new_container: ArchiveStorage<FastaMap, ShmemStorage> =
@@ -419,7 +429,8 @@ mod tests {
     #[test]
     fn test_write_and_read_from_file() {
         // Setup shmem fasta map
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         let container: ArchiveStorage<FastaMap, MemoryStorage> =
             ArchiveStorage::new(data.clone()).unwrap();
         // Write to a temporary file using write_to_file_direct
@@ -435,7 +446,8 @@ mod tests {
     #[test]
     fn test_write_and_read_invalid_magic() {
         // Setup shmem fasta map
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         // Write to a temporary file using write_to_file_direct
         let temp_file = NamedTempFile::new().unwrap();
         let temp_path = temp_file.path();
@@ -454,7 +466,8 @@ mod tests {
     #[test]
     fn test_truncate_file_to_zero() {
         // Setup shmem fasta map
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         // Write to a temporary file using write_to_file_direct
         let temp_file = NamedTempFile::new().unwrap();
         let temp_path = temp_file.path();
@@ -472,7 +485,8 @@ mod tests {
     #[test]
     fn test_write_and_read_corrupted_data() {
         // Setup shmem fasta map
-        let data = FastaMap::build("test-data/assemblies", true, 0, None, false, None).unwrap();
+        let data =
+            FastaMap::build("test-data/assemblies", true, 0, None, false, None, None).unwrap();
         // Write to a temporary file using write_to_file_direct
         let temp_file = NamedTempFile::new().unwrap();
         let temp_path = temp_file.path();
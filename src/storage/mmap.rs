@@ -29,6 +29,13 @@ impl LoadableStorage for MmapStorage {
             mmap,
         })
     }
+
+    fn will_read_all(&self) {
+        // Prefetch the whole file instead of faulting it in page by page.
+        // Hints are best-effort, so errors are ignored.
+        #[cfg(unix)]
+        let _ = self.mmap.advise(memmap2::Advice::WillNeed);
+    }
 }
 
 impl SharableStorage for MmapStorage {
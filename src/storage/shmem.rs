@@ -19,6 +19,10 @@ impl Storage for ShmemStorage {}
 impl MutableStorage for ShmemStorage {
     fn new(size: usize) -> anyhow::Result<Self> {
         let shmem = ShmemConf::new().size(size).create()?;
+        // Back large indices with transparent huge pages to reduce TLB pressure.
+        // This needs to happen before the pages are first written.
+        #[cfg(target_os = "linux")]
+        advise(&shmem, libc::MADV_HUGEPAGE);
         Ok(ShmemStorage { shmem })
     }
 
@@ -47,3 +51,12 @@ impl SharableStorage for ShmemStorage {
         Ok(ShmemStorage { shmem })
     }
 }
+
+/// Give the kernel a hint about the usage of the shared memory mapping.
+/// Hints are best-effort, so errors (e.g., on older kernels) are ignored.
+#[cfg(target_os = "linux")]
+fn advise(shmem: &Shmem, advice: libc::c_int) {
+    unsafe {
+        libc::madvise(shmem.as_ptr() as *mut libc::c_void, shmem.len(), advice);
+    }
+}
@@ -1,5 +1,14 @@
 use anyhow::{anyhow, Result};
-use std::path::Path;
+use memmap2::Mmap;
+use noodles::bgzf;
+use rayon::prelude::*;
+use std::any::Any;
+use std::collections::HashMap;
+use std::fs::File;
+use std::io::{self, BufReader, Read, Seek, SeekFrom};
+use std::path::{Path, PathBuf};
+use std::sync::{Arc, Mutex, OnceLock};
+use std::time::SystemTime;
 
 /// Get relative path from root, remove suffix, normalize path separators
 pub(crate) fn get_relative_name_without_suffix(
@@ -50,3 +59,339 @@ fn normalize_path_separators(path: &Path) -> Result<String> {
         .collect();
     Ok(components.join("/"))
 }
+
+/// Pick the number of indexing workers if the user did not specify one.
+///
+/// Parallel reads cause seek storms on spinning disks, so we fall back to a single
+/// worker there. Otherwise, we return `None` to use rayon's global thread pool.
+pub(crate) fn default_num_workers(root: &Path) -> Option<usize> {
+    if is_rotational(root) {
+        Some(1)
+    } else {
+        None
+    }
+}
+
+/// Check whether the block device backing `path` is rotational (i.e., an HDD).
+#[cfg(target_os = "linux")]
+fn is_rotational(path: &Path) -> bool {
+    use std::os::unix::fs::MetadataExt;
+    let Ok(metadata) = std::fs::metadata(path) else {
+        return false;
+    };
+    // Decode major and minor device numbers (see `gnu_dev_major` / `gnu_dev_minor` in glibc)
+    let dev = metadata.dev();
+    let major = ((dev >> 32) & 0xfffff000) | ((dev >> 8) & 0xfff);
+    let minor = ((dev >> 12) & 0xffffff00) | (dev & 0xff);
+    let device = Path::new("/sys/dev/block").join(format!("{}:{}", major, minor));
+    // Partitions do not have a queue directory, but their parent device does
+    [
+        device.join("queue/rotational"),
+        device.join("../queue/rotational"),
+    ]
+    .iter()
+    .find_map(|path| std::fs::read_to_string(path).ok())
+    .is_some_and(|content| content.trim() == "1")
+}
+
+#[cfg(not(target_os = "linux"))]
+fn is_rotational(_path: &Path) -> bool {
+    false
+}
+
+/// Read `buf.len()` bases of a FASTA sequence starting at base `start` of its contig.
+///
+/// `reader` must be positioned at that base. The FASTA index guarantees a fixed line layout per
+/// contig, so we can copy whole lines and skip the line terminators without inspecting the
+/// sequence bytes.
+pub(crate) fn read_fasta_lines_into<R: Read>(
+    reader: &mut R,
+    start: u64,
+    line_bases: u64,
+    line_width: u64,
+    buf: &mut [u8],
+) -> Result<()> {
+    let terminator_len = line_width.saturating_sub(line_bases);
+    if terminator_len == 0 {
+        // Without line terminators, the sequence is contiguous in the file
+        reader.read_exact(buf)?;
+        return Ok(());
+    }
+    let line_bases = line_bases as usize;
+    let mut column = (start % line_bases as u64) as usize;
+    let mut filled = 0;
+    while filled < buf.len() {
+        if column == line_bases {
+            let skipped = io::copy(&mut reader.take(terminator_len), &mut io::sink())?;
+            if skipped != terminator_len {
+                return Err(anyhow!(
+                    "End of file / sequence reached before reading {} nucleotides",
+                    buf.len()
+                ));
+            }
+            column = 0;
+        }
+        let n = (line_bases - column).min(buf.len() - filled);
+        reader.read_exact(&mut buf[filled..filled + n])?;
+        filled += n;
+        column += n;
+    }
+    Ok(())
+}
+
+/// Parse the index file at `path` with `read`, reusing the result of earlier calls in this
+/// process as long as the file is unchanged (see `file_version`).
+pub(crate) fn cached_index<T, F>(path: &str, read: F) -> Result<Arc<T>>
+where
+    T: Any + Send + Sync,
+    F: FnOnce(&str) -> io::Result<T>,
+{
+    type Entry = (FileVersion, Arc<dyn Any + Send + Sync>);
+    static INDICES: OnceLock<Mutex<HashMap<PathBuf, Entry>>> = OnceLock::new();
+    let indices = INDICES.get_or_init(Default::default);
+    let version = file_version(&std::fs::metadata(path)?)?;
+    let lock_error = |_| anyhow!("Index cache is poisoned");
+    if let Some((cached_version, index)) = indices.lock().map_err(lock_error)?.get(Path::new(path))
+    {
+        if *cached_version == version {
+            if let Ok(index) = index.clone().downcast::<T>() {
+                return Ok(index);
+            }
+        }
+    }
+    // Parse without holding the lock, so that other threads can look up other indices.
+    let index = Arc::new(read(path)?);
+    indices
+        .lock()
+        .map_err(lock_error)?
+        .insert(PathBuf::from(path), (version, index.clone()));
+    Ok(index)
+}
+
+/// Open a BGZF file for reading.
+///
+/// The file is buffered with the maximum BGZF block size, so that each block is fetched with a
+/// single read syscall instead of separate reads for its header, data and trailer.
+pub(crate) fn open_bgzf<P: AsRef<Path>>(path: P) -> Result<bgzf::io::Reader<BufReader<File>>> {
+    const MAX_BLOCK_SIZE: usize = 1 << 16;
+    let file = File::open(path)?;
+    Ok(bgzf::io::Reader::new(BufReader::with_capacity(
+        MAX_BLOCK_SIZE,
+        file,
+    )))
+}
+
+/// Decompress the uncompressed byte range `start..end` of a BGZF file, decoding its blocks in
+/// parallel.
+///
+/// `gzi` holds the `(compressed, uncompressed)` offsets of all blocks except the first one, as
+/// stored in a `.gzi` index.
+pub(crate) fn read_bgzf_range(
+    path: &str,
+    gzi: &[(u64, u64)],
+    start: u64,
+    end: u64,
+) -> Result<Vec<u8>> {
+    let block_start = |i: usize| if i == 0 { (0, 0) } else { gzi[i - 1] };
+    let first = gzi.partition_point(|&(_, uncompressed)| uncompressed <= start);
+    let last = gzi.partition_point(|&(_, uncompressed)| uncompressed < end);
+    let (compressed_start, _) = block_start(first);
+
+    // Read all compressed blocks covering the range at once
+    let mut file = File::open(path)?;
+    file.seek(SeekFrom::Start(compressed_start))?;
+    let mut compressed = Vec::new();
+    match gzi.get(last) {
+        Some(&(compressed_end, _)) => {
+            compressed.resize((compressed_end - compressed_start) as usize, 0);
+            file.read_exact(&mut compressed)?;
+        }
+        None => {
+            file.read_to_end(&mut compressed)?;
+        }
+    }
+
+    // Split the output into the parts covered by each block, so that every block is decoded
+    // straight into its part instead of being collected and copied afterwards
+    let mut data = vec![0; (end - start) as usize];
+    let mut blocks = Vec::with_capacity(last + 1 - first);
+    let mut rest = &mut data[..];
+    for i in first..=last {
+        let (block_compressed, block_uncompressed) = block_start(i);
+        let (block_compressed_end, block_end) = match gzi.get(i) {
+            Some(&(compressed_end, uncompressed_end)) => (
+                (compressed_end - compressed_start) as usize,
+                uncompressed_end.min(end),
+            ),
+            None => (compressed.len(), end),
+        };
+        let (part, tail) = std::mem::take(&mut rest)
+            .split_at_mut((block_end - start.max(block_uncompressed)) as usize);
+        rest = tail;
+        let block =
+            &compressed[(block_compressed - compressed_start) as usize..block_compressed_end];
+        blocks.push((block, start.saturating_sub(block_uncompressed), part));
+    }
+    with_process_pool(|| {
+        blocks
+            .into_par_iter()
+            .try_for_each(|(block, skip, part)| -> Result<()> {
+                let mut reader = bgzf::io::Reader::new(block);
+                io::copy(&mut (&mut reader).take(skip), &mut io::sink())?;
+                reader.read_exact(part).map_err(|_| {
+                    anyhow!("End of file reached before reading {} bytes", end - start)
+                })
+            })
+    })??;
+    Ok(data)
+}
+
+/// Identity of a file's contents: device, inode, modification time and size.
+type FileVersion = (u64, u64, SystemTime, u64);
+
+fn file_version(metadata: &std::fs::Metadata) -> io::Result<FileVersion> {
+    #[cfg(unix)]
+    let (dev, ino) = {
+        use std::os::unix::fs::MetadataExt;
+        (metadata.dev(), metadata.ino())
+    };
+    #[cfg(not(unix))]
+    let (dev, ino) = (0, 0);
+    Ok((dev, ino, metadata.modified()?, metadata.len()))
+}
+
+/// Memory-map the file at `path`, reusing the mapping of earlier calls in this process as long
+/// as the file is unchanged.
+///
+/// A replaced, modified or resized file is mapped again, so that reads do not combine a fresh
+/// index with stale data, or access pages past the end of a truncated file.
+pub(crate) fn mapped_file(path: &str) -> Result<Arc<Mmap>> {
+    type Entry = (FileVersion, Arc<Mmap>);
+    static MAPPED_FILES: OnceLock<Mutex<HashMap<PathBuf, Entry>>> = OnceLock::new();
+    let version = file_version(&std::fs::metadata(path)?)?;
+    let mut mapped_files = MAPPED_FILES
+        .get_or_init(Default::default)
+        .lock()
+        .map_err(|_| anyhow!("Mapped file cache is poisoned"))?;
+    if let Some((cached_version, mmap)) = mapped_files.get(Path::new(path)) {
+        if *cached_version == version {
+            return Ok(mmap.clone());
+        }
+    }
+    let file = File::open(path)?;
+    // Record the version of the file actually mapped, in case it changed since the check above
+    let version = file_version(&file.metadata()?)?;
+    let mmap = Arc::new(unsafe { Mmap::map(&file)? });
+    mapped_files.insert(PathBuf::from(path), (version, mmap.clone()));
+    Ok(mmap)
+}
+
+/// Build a thread pool with `num_workers` threads, optionally pinned to the CPUs of one NUMA node.
+///
+/// Pinning keeps the memory touched by the workers local to that node (first-touch policy).
+/// If only `numa_node` is given, one thread per CPU of the node is used.
+pub(crate) fn thread_pool(
+    num_workers: Option<usize>,
+    numa_node: Option<usize>,
+) -> Result<rayon::ThreadPool> {
+    let mut builder = rayon::ThreadPoolBuilder::new();
+    if let Some(workers) = num_workers {
+        builder = builder.num_threads(workers);
+    }
+    if let Some(node) = numa_node {
+        let cpus = numa_node_cpus(node)?;
+        if num_workers.is_none() {
+            builder = builder.num_threads(cpus.len());
+        }
+        builder = builder.start_handler(move |_| pin_to_cpus(&cpus));
+    }
+    Ok(builder.build()?)
+}
+
+/// Run `op` on a rayon thread pool that belongs to the current process.
+///
+/// Rayon's global pool does not survive `fork()`: a forked child inherits the pool but not its
+/// threads, so parallel work submitted to it waits forever. This pool is rebuilt whenever the
+/// process id changes, so parallel reads also work in forked workers (e.g., `multiprocessing`
+/// or PyTorch `DataLoader` workers on Linux).
+pub(crate) fn with_process_pool<OP, R>(op: OP) -> Result<R>
+where
+    OP: FnOnce() -> R + Send,
+    R: Send,
+{
+    static POOL: Mutex<Option<(u32, Arc<rayon::ThreadPool>)>> = Mutex::new(None);
+    let pool = {
+        let mut pool = POOL
+            .lock()
+            .map_err(|_| anyhow!("Thread pool is poisoned"))?;
+        match pool.as_ref() {
+            Some((pid, pool)) if *pid == std::process::id() => pool.clone(),
+            _ => {
+                // The threads of a pool inherited through fork() are gone, so it must not be
+                // dropped either
+                if let Some(inherited) = pool.take() {
+                    std::mem::forget(inherited);
+                }
+                let new_pool = Arc::new(rayon::ThreadPoolBuilder::new().build()?);
+                *pool = Some((std::process::id(), new_pool.clone()));
+                new_pool
+            }
+        }
+    };
+    Ok(pool.install(op))
+}
+
+#[cfg(target_os = "linux")]
+fn numa_node_cpus(node: usize) -> Result<Vec<usize>> {
+    let path = format!("/sys/devices/system/node/node{}/cpulist", node);
+    let cpulist = std::fs::read_to_string(path)
+        .map_err(|e| anyhow!("Could not read CPUs of NUMA node {}: {}", node, e))?;
+    parse_cpulist(cpulist.trim())
+}
+
+#[cfg(not(target_os = "linux"))]
+fn numa_node_cpus(_node: usize) -> Result<Vec<usize>> {
+    Err(anyhow!("NUMA pinning is only supported on Linux"))
+}
+
+/// Parse a kernel CPU list such as `0-3,8-11`.
+fn parse_cpulist(cpulist: &str) -> Result<Vec<usize>> {
+    let mut cpus = Vec::new();
+    for range in cpulist.split(',').filter(|range| !range.is_empty()) {
+        match range.split_once('-') {
+            Some((first, last)) => cpus.extend(first.parse::<usize>()?..=last.parse::<usize>()?),
+            None => cpus.push(range.parse()?),
+        }
+    }
+    Ok(cpus)
+}
+
+/// Pin the current thread to the given CPUs. Pinning is best-effort, so errors are ignored.
+#[cfg(target_os = "linux")]
+fn pin_to_cpus(cpus: &[usize]) {
+    unsafe {
+        let mut set: libc::cpu_set_t = std::mem::zeroed();
+        for &cpu in cpus {
+            libc::CPU_SET(cpu, &mut set);
+        }
+        libc::sched_setaffinity(0, std::mem::size_of::<libc::cpu_set_t>(), &set);
+    }
+}
+
+#[cfg(not(target_os = "linux"))]
+fn pin_to_cpus(_cpus: &[usize]) {}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_parse_cpulist() {
+        assert_eq!(parse_cpulist("0").unwrap(), vec![0]);
+        assert_eq!(
+            parse_cpulist("0-3,8-9,12").unwrap(),
+            vec![0, 1, 2, 3, 8, 9, 12]
+        );
+        assert!(parse_cpulist("0-a").is_err());
+    }
+}
@@ -1,20 +1,27 @@
 import gzip
+import importlib
+import multiprocessing
+import os
 import shutil
 import tempfile
-from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise
 from pathlib import Path
 from typing import Iterator
 
 import numpy as np
-import polars as pl
-import pyfaidx
 import pytest
 
+# Free space needed to keep all decompressed fixtures (about 400 MB) on a tmpfs
+_TMPFS_MIN_FREE = 1 << 30
+
 _TEST_REGIONS = [
     dict(name="GCA_000146045.2", contig="BK006935.2", start=0, length=60),
     dict(name="GCA_000146045.2", contig="BK006949.2", start=200000, length=60),
     dict(name="GCF_000182965.3", contig="NC_032094.1", start=1032000, length=1033292 - 1032000),
     dict(name="GCF_003013715.1", contig="NC_072815.1", start=10000, length=10000),
+    # Long enough (> 1 MiB) for the BGZF blocks to be decoded in parallel
+    dict(name="GCF_003013715.1", contig="NC_072812.1", start=100000, length=1_500_000),
     dict(name="foo/GCA_000146045.2", contig="BK006935.2", start=0, length=60),
     dict(name="foo/GCA_000146045.2", contig="BK006949.2", start=180000, length=60),
     dict(name="foo/bar/GCF_000182965.3", contig="NC_032094.1", start=2000, length=63),
@@ -44,14 +51,29 @@ def tracks_path() -> Path:
     return Path("test-data") / "tracks"
 
 
-@contextmanager
-def pyfaidx_fasta(path: Path) -> Iterator[pyfaidx.Fasta]:
-    with tempfile.TemporaryDirectory(prefix="fastar-loader-tests-") as tmpdir:
-        uncompressed_path = Path(tmpdir) / "assembly.fna"
-        with open(uncompressed_path, "wb") as f, gzip.open(path, "rb") as gz:
-            shutil.copyfileobj(gz, f)
-        with pyfaidx.Fasta(uncompressed_path) as fasta:
-            yield fasta
+@pytest.fixture(scope="session")
+def spawn_pool() -> Iterator[ProcessPoolExecutor]:
+    # Spawning workers is slow, so share one pool and import the package while it starts up
+    with ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=importlib.import_module,
+        initargs=("fastar_loader",),
+    ) as executor:
+        yield executor
+
+
+@pytest.fixture(scope="session")
+def decompressed_fastas(assemblies_path: Path) -> Iterator[dict[str, Path]]:
+    with tempfile.TemporaryDirectory(prefix="fastar-loader-tests-", dir=_tmpdir()) as tmpdir:
+        yield _DecompressedFiles(assemblies_path, ".fna.gz", Path(tmpdir))
+
+
+@pytest.fixture(scope="session")
+def decompressed_tracks(tracks_path: Path) -> Iterator[dict[str, Path]]:
+    # Decompressed independently of the BGZF index, to serve as a reference
+    with tempfile.TemporaryDirectory(prefix="fastar-loader-tests-", dir=_tmpdir()) as tmpdir:
+        yield _DecompressedFiles(tracks_path, ".track.gz", Path(tmpdir))
 
 
 @pytest.fixture(
@@ -61,14 +83,18 @@ def pyfaidx_fasta(path: Path) -> Iterator[pyfaidx.Fasta]:
 def fasta_test_data(
     request: pytest.FixtureRequest,
     assemblies_path: Path,
+    decompressed_fastas: dict[str, Path],
 ) -> tuple[Path, str, str, int, int, np.ndarray]:
+    # pyfaidx is only needed for the reference sequences, so import it lazily
+    import pyfaidx
+
     param = request.param
     name = param["name"]
     contig = param["contig"]
     start = param["start"]
     length = param["length"]
     path = assemblies_path / f"{name}.fna.gz"
-    with pyfaidx_fasta(path) as fasta:
+    with pyfaidx.Fasta(decompressed_fastas[name]) as fasta:
         record = fasta[contig][start : start + length]
         assert record is not None
         sequence = np.frombuffer(record.seq.encode("utf-8"), dtype=np.uint8)
@@ -88,16 +114,9 @@ def fasta_test_data(
 def fasta_structure(assemblies_path: Path) -> dict[str, list[tuple[str, int]]]:
     fasta_structure = {}
     for path in assemblies_path.glob("*.fna.gz.fai"):
-        name = path.name.strip(".fna.gz.fai")
-        index = pl.read_csv(
-            path,
-            separator="\t",
-            has_header=False,
-            new_columns=["contig", "length", "offset", "line_bases", "line_width"],
-        )
-        fasta_structure[name] = [
-            (row["contig"], row["length"]) for row in index.iter_rows(named=True)
-        ]
+        name = path.name.removesuffix(".fna.gz.fai")
+        # columns: contig, length, offset, line_bases, line_width
+        fasta_structure[name] = [(row[0], int(row[1])) for row in _read_tsv(path)]
     return fasta_structure
 
 
@@ -108,6 +127,7 @@ def fasta_structure(assemblies_path: Path) -> dict[str, list[tuple[str, int]]]:
 def track_test_data(
     request: pytest.FixtureRequest,
     tracks_path: Path,
+    decompressed_tracks: dict[str, Path],
 ) -> tuple[Path, str, str, int, int, np.ndarray]:
     # parse request
     param = request.param
@@ -118,27 +138,17 @@ def track_test_data(
     path = tracks_path / f"{name}.track.gz"
 
     # find region
-    index = pl.read_csv(
-        f"{path}.idx",
-        separator="\t",
-        has_header=False,
-        new_columns=["contig", "offset"],
-    )
-    row = index.filter(pl.col("contig") == contig).select(pl.col("offset"))
-    assert len(row) > 0
-    offset = row.item() // 4 + start
+    index = _read_track_index(Path(f"{path}.idx"))
+    offsets = [row_offset for row_contig, row_offset in index if row_contig == contig]
+    assert len(offsets) == 1
+    offset = offsets[0] // 4 + start
 
     # read data
-    with tempfile.TemporaryDirectory(prefix="fastar-loader-tests-") as tmpdir:
-        uncompressed_path = Path(tmpdir) / "track"
-        with open(uncompressed_path, "wb") as f, gzip.open(path, "rb") as gz:
-            shutil.copyfileobj(gz, f)
-        mmap = np.memmap(uncompressed_path, dtype=np.float32, mode="r")
-        last_offset = index["offset"].last()
-        assert isinstance(last_offset, int)
-        assert mmap.shape[0] == last_offset / 4
-        assert offset + length <= mmap.shape[0]
-        data = mmap[offset : offset + length]
+    uncompressed_path = decompressed_tracks[name]
+    last_offset = index[-1][1]
+    assert os.path.getsize(uncompressed_path) == last_offset
+    assert offset + length <= last_offset // 4
+    data = np.fromfile(uncompressed_path, dtype=np.float32, count=length, offset=offset * 4)
 
     return (
         path,
@@ -154,15 +164,48 @@ def track_test_data(
 def track_structure(tracks_path: Path) -> dict[str, list[tuple[str, int]]]:
     track_structure = {}
     for path in tracks_path.glob("*.track.gz.idx"):
-        name = path.name.strip(".track.gz.idx")
-        index = pl.read_csv(
-            path,
-            separator="\t",
-            has_header=False,
-            new_columns=["contig", "offset"],
-        )
+        name = path.name.removesuffix(".track.gz.idx")
+        index = _read_track_index(path)
         track_structure[name] = [
-            (index["contig"][i], index["offset"][i + 1] - index["offset"][i])
-            for i in range(len(index) - 1)
+            (contig, next_offset - offset) for (contig, offset), (_, next_offset) in pairwise(index)
         ]
     return track_structure
+
+
+class _DecompressedFiles(dict[str, Path]):
+    """Maps names to decompressed copies of `root / f"{name}{suffix}"`, created on first access."""
+
+    def __init__(self, root: Path, suffix: str, tmpdir: Path):
+        super().__init__()
+        self._root = root
+        self._suffix = suffix
+        self._tmpdir = tmpdir
+
+    def __missing__(self, name: str) -> Path:
+        # Keep the uncompressed extension, e.g. `.fna` for pyfaidx
+        uncompressed_path = self._tmpdir / f"file-{len(self)}{self._suffix.removesuffix('.gz')}"
+        _decompress(self._root / f"{name}{self._suffix}", uncompressed_path)
+        self[name] = uncompressed_path
+        return uncompressed_path
+
+
+def _tmpdir() -> str | None:
+    # Prefer a tmpfs for decompressed fixtures so they never hit the disk, but only if it has
+    # room for them (e.g., Docker's default /dev/shm only has 64 MB)
+    if os.path.isdir("/dev/shm") and shutil.disk_usage("/dev/shm").free >= _TMPFS_MIN_FREE:
+        return "/dev/shm"
+    return None
+
+
+def _decompress(path: Path, uncompressed_path: Path) -> None:
+    # BGZF is a multi-member gzip stream, which gzip.decompress inflates in one go
+    uncompressed_path.write_bytes(gzip.decompress(path.read_bytes()))
+
+
+def _read_tsv(path: Path) -> list[list[str]]:
+    return [line.split("\t") for line in path.read_text().splitlines()]
+
+
+def _read_track_index(path: Path) -> list[tuple[str, int]]:
+    # columns: contig, offset; the last row only holds the end offset
+    return [(row[0], int(row[1])) for row in _read_tsv(path)]
@@ -1,5 +1,7 @@
 import multiprocessing
+import os
 import pickle
+import sys
 from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
@@ -9,7 +11,8 @@ from fastar_loader import FastarLoader
 from numpy.testing import assert_array_equal
 
 
-@pytest.fixture()
+# The loader is only read from, so share it between the tests of this module
+@pytest.fixture(scope="module")
 def loader(assemblies_path: Path) -> FastarLoader:
     loader = FastarLoader(assemblies_path, no_cache=True, storage_method="memory")
     return loader
@@ -19,11 +22,35 @@ def test_names(loader: FastarLoader, expected_names: list[str]) -> None:
     names = loader.names
     assert len(names) == len(expected_names)
     assert all(name in names for name in expected_names)
+    assert "does-not-exist" not in names
 
 
 def test_structure(loader: FastarLoader, fasta_structure: dict[str, list[tuple[str, int]]]) -> None:
     for name, contigs in fasta_structure.items():
         assert loader.contigs(name) == contigs
+        assert loader.contigs(name) is loader.contigs(name)
+
+
+def test_all_contigs(
+    loader: FastarLoader, fasta_structure: dict[str, list[tuple[str, int]]]
+) -> None:
+    all_contigs = loader.all_contigs()
+    assert list(all_contigs) == list(loader.names)
+    assert {name: all_contigs[name] for name in fasta_structure} == fasta_structure
+
+
+def test_contig_list(
+    loader: FastarLoader, fasta_structure: dict[str, list[tuple[str, int]]]
+) -> None:
+    for name, contigs in fasta_structure.items():
+        contig_list = loader.contigs(name)
+        assert len(contig_list) == len(contigs)
+        assert contig_list.to_list() == contigs
+        assert contig_list[0] == contigs[0]
+        assert contig_list[-1] == contigs[-1]
+        assert contig_list[1:3] == contigs[1:3]
+        assert contig_list.names == [contig for contig, _ in contigs]
+        assert contig_list.lengths.tolist() == [length for _, length in contigs]
 
 
 def test_custom_num_workers(
@@ -38,12 +65,25 @@ def test_custom_num_workers(
         assert loader.contigs(name) == contigs
 
 
+@pytest.mark.skipif(
+    not os.path.isdir("/sys/devices/system/node/node0"), reason="NUMA pinning needs Linux sysfs"
+)
+def test_numa_node(loader: FastarLoader, assemblies_path: Path) -> None:
+    pinned = FastarLoader(assemblies_path, no_cache=True, storage_method="memory", numa_node=0)
+    assert pinned.names == loader.names
+    for name in loader.names:
+        assert pinned.contigs(name) == loader.contigs(name)
+    with pytest.raises(RuntimeError):
+        FastarLoader(assemblies_path, no_cache=True, storage_method="memory", numa_node=1_000_000)
+
+
 def test_custom_names(
     assemblies_path: Path,
     expected_names: list[str],
     fasta_structure: dict[str, list[tuple[str, int]]],
 ) -> None:
-    loader = FastarLoader(assemblies_path, names=expected_names[:2])
+    # Duplicate names are only indexed once
+    loader = FastarLoader(assemblies_path, names=expected_names[:2] + expected_names[:1])
     names = loader.names
     assert len(names) == len(expected_names[:2])
     for name, contigs in fasta_structure.items():
@@ -59,6 +99,38 @@ def test_read_sequence(
     assert_array_equal(sequence, expected_sequence)
 
 
+def test_read_sequence_by_handle(
+    loader: FastarLoader, fasta_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = fasta_test_data
+    handle = loader.contig_handle(name, contig)
+    assert loader.contig_handle(name, contig) == handle
+    sequence = loader.read_sequence_by_handle(handle, start, length)
+    assert_array_equal(sequence, expected_sequence)
+    with pytest.raises(RuntimeError):
+        loader.contig_handle(name, "does-not-exist")
+
+
+def test_read_sequences(
+    loader: FastarLoader, fasta_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = fasta_test_data
+    sequences = loader.read_sequences([(name, contig, start, length)] * 2)
+    assert len(sequences) == 2
+    for sequence in sequences:
+        assert_array_equal(sequence, expected_sequence)
+
+
+def test_read_windows(
+    loader: FastarLoader, fasta_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = fasta_test_data
+    windows = loader.read_windows([(name, contig, start)] * 2, length)
+    assert windows.shape == (2, length)
+    for window in windows:
+        assert_array_equal(window, expected_sequence)
+
+
 @pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
 def test_pickle(
     assemblies_path: Path,
@@ -73,6 +145,29 @@ def test_pickle(
 
     pickled_loader = pickle.dumps(loader)
     unpickled_loader = pickle.loads(pickled_loader)
+    assert unpickled_loader.is_shared == (storage_method != "memory")
+
+    sequence = unpickled_loader.read_sequence(name, contig, start, length)
+    assert_array_equal(sequence, expected_sequence)
+    clean_cache(assemblies_path)
+
+
+@pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
+def test_pickle_out_of_band(
+    assemblies_path: Path,
+    fasta_test_data: tuple[Path, str, str, int, int, np.ndarray],
+    storage_method: str,
+) -> None:
+    clean_cache(assemblies_path)
+    loader = FastarLoader(assemblies_path, no_cache=False, storage_method=storage_method)
+    _, name, contig, start, length, expected_sequence = fasta_test_data
+
+    buffers: list[pickle.PickleBuffer] = []
+    pickled_loader = pickle.dumps(loader, protocol=5, buffer_callback=buffers.append)
+    assert len(buffers) == 1
+    # The index (or its shared handle) travels out-of-band, only metadata is in-band
+    assert len(pickled_loader) < 4096
+    unpickled_loader = pickle.loads(pickled_loader, buffers=buffers)
 
     sequence = unpickled_loader.read_sequence(name, contig, start, length)
     assert_array_equal(sequence, expected_sequence)
@@ -84,6 +179,7 @@ def test_multiprocess(
     assemblies_path: Path,
     fasta_test_data: tuple[Path, str, str, int, int, np.ndarray],
     storage_method: str,
+    spawn_pool: ProcessPoolExecutor,
 ) -> None:
     clean_cache(assemblies_path)
     loader = FastarLoader(assemblies_path, no_cache=False, storage_method=storage_method)
@@ -91,31 +187,75 @@ def test_multiprocess(
     sequence = loader.read_sequence(name, contig, start, length)
     assert_array_equal(sequence, expected_sequence)
 
-    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
-        future = executor.submit(loader.read_sequence, name, contig, start, length)
-        sequence = future.result()
+    sequence = spawn_pool.submit(loader.read_sequence, name, contig, start, length).result()
 
     assert_array_equal(sequence, expected_sequence)
     clean_cache(assemblies_path)
 
 
+@pytest.mark.skipif(sys.platform != "linux", reason="fork is only reliable on Linux")
 @pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
-def test_cache(assemblies_path: Path, storage_method: str) -> None:
-    ref = FastarLoader(assemblies_path, no_cache=True, storage_method="memory")
+def test_multiprocess_fork(
+    assemblies_path: Path,
+    fasta_test_data: tuple[Path, str, str, int, int, np.ndarray],
+    storage_method: str,
+) -> None:
+    clean_cache(assemblies_path)
+    loader = FastarLoader(assemblies_path, no_cache=False, storage_method=storage_method)
+    _, name, contig, start, length, expected_sequence = fasta_test_data
 
+    # Start the thread pool of batched reads before forking, so the workers inherit it
+    queries = [(name, contig, start, length)] * 2
+    loader.read_sequences(queries)
+
+    # Forked workers inherit the loader from the initializer instead of unpickling it. The pool
+    # terminates its workers on exit, so a worker waiting on threads that did not survive the
+    # fork makes the test time out instead of hanging.
+    with multiprocessing.get_context("fork").Pool(
+        1, initializer=_set_worker_loader, initargs=(loader,)
+    ) as pool:
+        sequence = pool.apply_async(_worker_read, (name, contig, start, length)).get(timeout=60)
+        sequences = pool.apply_async(_worker_read_sequences, (queries,)).get(timeout=60)
+    assert_array_equal(sequence, expected_sequence)
+    assert len(sequences) == 2
+    for sequence in sequences:
+        assert_array_equal(sequence, expected_sequence)
+    clean_cache(assemblies_path)
+
+
+_worker_loader: FastarLoader | None = None
+
+
+def _set_worker_loader(loader: FastarLoader) -> None:
+    global _worker_loader
+    _worker_loader = loader
+
+
+def _worker_read(name: str, contig: str, start: int, length: int) -> np.ndarray:
+    assert _worker_loader is not None
+    return _worker_loader.read_sequence(name, contig, start, length)
+
+
+def _worker_read_sequences(queries: list[tuple[str, str, int, int]]) -> list[np.ndarray]:
+    assert _worker_loader is not None
+    return _worker_loader.read_sequences(queries)
+
+
+@pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
+def test_cache(loader: FastarLoader, assemblies_path: Path, storage_method: str) -> None:
     # Load without cache
     clean_cache(assemblies_path)
     nocache = FastarLoader(assemblies_path, storage_method=storage_method)
     assert len(list(assemblies_path.glob(".fasta-map-cache-*"))) == 1
-    assert ref.names == nocache.names
-    for name in ref.names:
-        assert ref.contigs(name) == nocache.contigs(name)
+    assert loader.names == nocache.names
+    for name in loader.names:
+        assert loader.contigs(name) == nocache.contigs(name)
 
     # Load with cache
     cache = FastarLoader(assemblies_path, storage_method=storage_method)
-    assert ref.names == cache.names
-    for name in ref.names:
-        assert ref.contigs(name) == cache.contigs(name)
+    assert loader.names == cache.names
+    for name in loader.names:
+        assert loader.contigs(name) == cache.contigs(name)
 
     # Clean up cache
     clean_cache(assemblies_path)
@@ -126,14 +266,15 @@ def clean_cache(assemblies_path: Path) -> None:
         cache_file.unlink(missing_ok=True)
 
 
-def test_min_contig_length(assemblies_path: Path, expected_names: list[str]) -> None:
+def test_min_contig_length(
+    loader: FastarLoader, assemblies_path: Path, expected_names: list[str]
+) -> None:
     min_length = 1_000_000
-    ref = FastarLoader(assemblies_path, no_cache=True, storage_method="memory")
     restricted = FastarLoader(
         assemblies_path, min_contig_length=min_length, no_cache=True, storage_method="memory"
     )
     for name in expected_names:
-        ref_contigs = ref.contigs(name)
+        ref_contigs = loader.contigs(name)
         restricted_contigs = restricted.contigs(name)
         for contig, length in ref_contigs:
             if length >= min_length:
@@ -1,7 +1,7 @@
 from pathlib import Path
 
 import numpy as np
-from fastar_loader import read_sequence  # type: ignore
+from fastar_loader import read_sequence, read_sequences  # type: ignore
 from numpy.testing import assert_array_equal
 
 
@@ -19,3 +19,23 @@ def test_read_sequence_implicit_index(
     path, _, contig, start, length, sequence = fasta_test_data
     rust_sequence = read_sequence(str(path), contig, start, length)
     assert_array_equal(rust_sequence, sequence)
+
+
+def test_read_sequence_uncompressed(
+    fasta_test_data: tuple[Path, str, str, int, int, np.ndarray],
+    decompressed_fastas: dict[str, Path],
+) -> None:
+    path, name, contig, start, length, sequence = fasta_test_data
+    # The .fai offsets refer to the uncompressed data and thus also apply to the plain file
+    rust_sequence = read_sequence(
+        decompressed_fastas[name], contig, start, length, fai_path=f"{path}.fai"
+    )
+    assert_array_equal(rust_sequence, sequence)
+
+
+def test_read_sequences(fasta_test_data: tuple[Path, str, str, int, int, np.ndarray]) -> None:
+    path, _, contig, start, length, sequence = fasta_test_data
+    rust_sequences = read_sequences(path, [(contig, start, length)] * 2)
+    assert len(rust_sequences) == 2
+    for rust_sequence in rust_sequences:
+        assert_array_equal(rust_sequence, sequence)
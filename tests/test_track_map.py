@@ -1,5 +1,7 @@
 import multiprocessing
+import os
 import pickle
+import sys
 from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
@@ -9,7 +11,8 @@ from fastar_loader import TrackLoader
 from numpy.testing import assert_array_equal
 
 
-@pytest.fixture()
+# The loader is only read from, so share it between the tests of this module
+@pytest.fixture(scope="module")
 def loader(tracks_path: Path) -> TrackLoader:
     loader = TrackLoader(tracks_path, no_cache=True, storage_method="memory")
     return loader
@@ -19,6 +22,7 @@ def test_names(loader: TrackLoader, expected_names: list[str]) -> None:
     names = loader.names
     assert len(names) == len(expected_names)
     assert all(name in names for name in expected_names)
+    assert "does-not-exist" not in names
 
 
 def test_structure(loader: TrackLoader, track_structure: dict[str, list[tuple[str, int]]]) -> None:
@@ -26,6 +30,14 @@ def test_structure(loader: TrackLoader, track_structure: dict[str, list[tuple[st
         assert loader.contigs(name) == contigs
 
 
+def test_all_contigs(
+    loader: TrackLoader, track_structure: dict[str, list[tuple[str, int]]]
+) -> None:
+    all_contigs = loader.all_contigs()
+    assert list(all_contigs) == list(loader.names)
+    assert {name: all_contigs[name] for name in track_structure} == track_structure
+
+
 def test_custom_num_workers(
     tracks_path: Path, expected_names: list[str], track_structure: dict[str, list[tuple[str, int]]]
 ) -> None:
@@ -36,12 +48,25 @@ def test_custom_num_workers(
         assert loader.contigs(name) == contigs
 
 
+@pytest.mark.skipif(
+    not os.path.isdir("/sys/devices/system/node/node0"), reason="NUMA pinning needs Linux sysfs"
+)
+def test_numa_node(loader: TrackLoader, tracks_path: Path) -> None:
+    pinned = TrackLoader(tracks_path, no_cache=True, storage_method="memory", numa_node=0)
+    assert pinned.names == loader.names
+    for name in loader.names:
+        assert pinned.contigs(name) == loader.contigs(name)
+    with pytest.raises(RuntimeError):
+        TrackLoader(tracks_path, no_cache=True, storage_method="memory", numa_node=1_000_000)
+
+
 def test_custom_names(
     tracks_path: Path,
     expected_names: list[str],
     track_structure: dict[str, list[tuple[str, int]]],
 ) -> None:
-    loader = TrackLoader(tracks_path, names=expected_names[:2])
+    # Duplicate names are only indexed once
+    loader = TrackLoader(tracks_path, names=expected_names[:2] + expected_names[:1])
     names = loader.names
     assert len(names) == len(expected_names[:2])
     for name, contigs in track_structure.items():
@@ -57,6 +82,48 @@ def test_read_sequence(
     assert_array_equal(sequence, expected_sequence)
 
 
+def test_read_sequence_f32(
+    loader: TrackLoader, track_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = track_test_data
+    sequence = loader.read_sequence_f32(name, contig, start, length)
+    assert sequence.dtype == np.float32
+    assert sequence.flags.aligned
+    assert_array_equal(sequence, expected_sequence)
+
+
+def test_read_sequence_by_handle(
+    loader: TrackLoader, track_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = track_test_data
+    handle = loader.contig_handle(name, contig)
+    assert loader.contig_handle(name, contig) == handle
+    sequence = loader.read_sequence_by_handle(handle, start * 4, length * 4)
+    assert_array_equal(np.frombuffer(sequence, dtype=np.float32), expected_sequence)
+    with pytest.raises(RuntimeError):
+        loader.contig_handle(name, "does-not-exist")
+
+
+def test_read_sequences(
+    loader: TrackLoader, track_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = track_test_data
+    sequences = loader.read_sequences([(name, contig, start * 4, length * 4)] * 2)
+    assert len(sequences) == 2
+    for sequence in sequences:
+        assert_array_equal(np.frombuffer(sequence, dtype=np.float32), expected_sequence)
+
+
+def test_read_windows(
+    loader: TrackLoader, track_test_data: tuple[Path, str, str, int, int, np.ndarray]
+) -> None:
+    _, name, contig, start, length, expected_sequence = track_test_data
+    windows = loader.read_windows([(name, contig, start * 4)] * 2, length * 4)
+    assert windows.shape == (2, length * 4)
+    for window in windows.view(np.float32):
+        assert_array_equal(window, expected_sequence)
+
+
 @pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
 def test_pickle(
     tracks_path: Path,
@@ -77,11 +144,34 @@ def test_pickle(
     clean_cache(tracks_path)
 
 
+@pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
+def test_pickle_out_of_band(
+    tracks_path: Path,
+    track_test_data: tuple[Path, str, str, int, int, np.ndarray],
+    storage_method: str,
+) -> None:
+    clean_cache(tracks_path)
+    loader = TrackLoader(tracks_path, no_cache=False, storage_method=storage_method)
+    _, name, contig, start, length, expected_sequence = track_test_data
+
+    buffers: list[pickle.PickleBuffer] = []
+    pickled_loader = pickle.dumps(loader, protocol=5, buffer_callback=buffers.append)
+    assert len(buffers) == 1
+    # The index (or its shared handle) travels out-of-band, only metadata is in-band
+    assert len(pickled_loader) < 4096
+    unpickled_loader = pickle.loads(pickled_loader, buffers=buffers)
+
+    sequence = _read_f32(unpickled_loader, name, contig, start, length)
+    assert_array_equal(sequence, expected_sequence)
+    clean_cache(tracks_path)
+
+
 @pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
 def test_multiprocess(
     tracks_path: Path,
     track_test_data: tuple[Path, str, str, int, int, np.ndarray],
     storage_method: str,
+    spawn_pool: ProcessPoolExecutor,
 ) -> None:
     clean_cache(tracks_path)
     loader = TrackLoader(tracks_path, no_cache=False, storage_method=storage_method)
@@ -89,30 +179,74 @@ def test_multiprocess(
     sequence = _read_f32(loader, name, contig, start, length)
     assert_array_equal(sequence, expected_sequence)
 
-    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
-        future = executor.submit(_read_f32, loader, name, contig, start, length)
-        sequence = future.result()
+    sequence = spawn_pool.submit(_read_f32, loader, name, contig, start, length).result()
     assert_array_equal(sequence, expected_sequence)
     clean_cache(tracks_path)
 
 
+@pytest.mark.skipif(sys.platform != "linux", reason="fork is only reliable on Linux")
 @pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
-def test_cache(tracks_path: Path, storage_method: str) -> None:
-    ref = TrackLoader(tracks_path, no_cache=True, storage_method="memory")
+def test_multiprocess_fork(
+    tracks_path: Path,
+    track_test_data: tuple[Path, str, str, int, int, np.ndarray],
+    storage_method: str,
+) -> None:
+    clean_cache(tracks_path)
+    loader = TrackLoader(tracks_path, no_cache=False, storage_method=storage_method)
+    _, name, contig, start, length, expected_sequence = track_test_data
 
+    # Start the thread pool of batched reads before forking, so the workers inherit it
+    queries = [(name, contig, start * 4, length * 4)] * 2
+    loader.read_sequences(queries)
+
+    # Forked workers inherit the loader from the initializer instead of unpickling it. The pool
+    # terminates its workers on exit, so a worker waiting on threads that did not survive the
+    # fork makes the test time out instead of hanging.
+    with multiprocessing.get_context("fork").Pool(
+        1, initializer=_set_worker_loader, initargs=(loader,)
+    ) as pool:
+        sequence = pool.apply_async(_worker_read, (name, contig, start, length)).get(timeout=60)
+        sequences = pool.apply_async(_worker_read_sequences, (queries,)).get(timeout=60)
+    assert_array_equal(sequence, expected_sequence)
+    assert len(sequences) == 2
+    for sequence in sequences:
+        assert_array_equal(np.frombuffer(sequence, dtype=np.float32), expected_sequence)
+    clean_cache(tracks_path)
+
+
+_worker_loader: TrackLoader | None = None
+
+
+def _set_worker_loader(loader: TrackLoader) -> None:
+    global _worker_loader
+    _worker_loader = loader
+
+
+def _worker_read(name: str, contig: str, start: int, length: int) -> np.ndarray:
+    assert _worker_loader is not None
+    return _read_f32(_worker_loader, name, contig, start, length)
+
+
+def _worker_read_sequences(queries: list[tuple[str, str, int, int]]) -> list[np.ndarray]:
+    assert _worker_loader is not None
+    return _worker_loader.read_sequences(queries)
+
+
+@pytest.mark.parametrize("storage_method", ["shmem", "mmap", "memory"])
+def test_cache(loader: TrackLoader, tracks_path: Path, storage_method: str) -> None:
     # Load without cache
     clean_cache(tracks_path)
     nocache = TrackLoader(tracks_path, storage_method=storage_method)
     assert len(list(tracks_path.glob(".track-map-cache-*"))) == 1
-    assert ref.names == nocache.names
-    for name in ref.names:
-        assert ref.contigs(name) == nocache.contigs(name)
+    assert loader.names == nocache.names
+    for name in loader.names:
+        assert loader.contigs(name) == nocache.contigs(name)
 
     # Load with cache
     cache = TrackLoader(tracks_path, storage_method=storage_method)
-    assert ref.names == cache.names
-    for name in ref.names:
-        assert ref.contigs(name) == cache.contigs(name)
+    assert loader.names == cache.names
+    for name in loader.names:
+        assert loader.contigs(name) == cache.contigs(name)
 
     # Clean up cache
     clean_cache(tracks_path)
@@ -123,16 +257,17 @@ def clean_cache(assemblies_path: Path) -> None:
         cache_file.unlink(missing_ok=True)
 
 
-def test_min_contig_length(tracks_path: Path, expected_names: list[str]) -> None:
+def test_min_contig_length(
+    loader: TrackLoader, tracks_path: Path, expected_names: list[str]
+) -> None:
     min_length = 1_000_000
-    ref = TrackLoader(tracks_path, no_cache=True, storage_method="memory")
     restricted = TrackLoader(
         tracks_path, min_contig_length=min_length, no_cache=True, storage_method="memory"
     )
-    print(ref.names)
+    print(loader.names)
     print(restricted.names)
     for name in expected_names:
-        ref_contigs = ref.contigs(name)
+        ref_contigs = loader.contigs(name)
         print(ref_contigs)
         restricted_contigs = restricted.contigs(name)
         print(restricted_contigs)